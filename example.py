@@ -18,18 +18,22 @@ cv = visC.VisCanvas(canvas, WIDTH, HEIGHT)
 
 ### CODE START -- initial setup
 cv.add_sprite(visC.Dot("#FFF", "#FFF", 10, 50, 50, 0.5), "dot")
+cv.add_wall(0, HEIGHT, WIDTH, 10) # floor for the falling dot
 cv.add_sprite(visC.Rect("#000", "#FFF", 500, 100, 100, 150), "rect")
 keyCodeText = visC.Text("Hello", 500, 100, 150, color="#FFF", autoSize=False)
 cv.add_sprite(keyCodeText, "text")
 keyCodeText2 = visC.Text("A", 500, 100, 300, color="#FFF", autoSize=True)
 cv.add_sprite(keyCodeText2, "text")
 
-slider1 = visC.HorizontalSlider("#000", "#FFF", "#FFF", "#FFF", 250, 15, 250, HEIGHT-100)
+# onChange is called at most every 0.05 seconds while dragging
+slider1 = visC.HorizontalSlider("#000", "#FFF", "#FFF", "#FFF", 250, 15, 250, HEIGHT-100, minVal=0, maxVal=100, onChange=lambda val: keyCodeText.change_text('Slider at %d\n' % val), changeDelay=0.05)
 cv.add_sprite(slider1)
 
 cv.add_button_and_sprite(visC.Rect("#aaa", "#aaa", 100, 50, 10, 10), "button1")
 
 cv.start_text_input()
+cv.bind_text_input(keyCodeText2) # keyCodeText2 shows what is typed
+# cv.enable_profiling(overlay=True) # live frame stats, save them with cv.export_profile("profile.json")
 ### CODE END
 
 # for sprite in cv.get_sprites_with_tag("dot"):
@@ -37,19 +41,15 @@ cv.start_text_input()
 #     sprite.change_pos(200, 100, 30)
 
 
+# called once per frame for each key pressed since the last frame
 def onKeyPress(event):
-    cv.update_keyboard_input(event.keysym)
-    
     ### CODE START - handle key presses
     keyCodeText.change_text('You pressed %s\n' % event.keysym)
-    keyCodeText2.change_text(cv.get_text_input())
     ### CODE END
 
+# called once per frame for each click since the last frame
 def get_mouse_coords(event):
-    clickX = event.x
-    clickY = event.y
-
-    signals = cv.update_mouse_click(clickX, clickY)
+    signals = event.signals
     ### CODE START - handle mouse click
     if len(signals) > 0:
         if signals[0] == "button1":
@@ -59,16 +59,13 @@ def get_mouse_coords(event):
 
 def update():
     ### CODE START - general update stuff
-
+    pass
     ### CODE END
 
-    cv.update()
-
-    # Schedule the next frame
-    canvas.after(int(1000/FPS), update)  # ~30 FPS
-
-root.bind('<KeyPress>', onKeyPress)
-root.bind('<Button-1>', get_mouse_coords)
+cv.bind_input(root)
+cv.add_input_listener("key", onKeyPress)
+cv.add_input_listener("click", get_mouse_coords)
 
-update()
+# steps at a fixed FPS, calling update before each step
+cv.run(FPS, update)
 root.mainloop()
\ No newline at end of file
@@ -1,13 +1,16 @@
 import tkinter as tk
 from urllib.request import urlopen
 import json
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 from PIL import Image, ImageTk
 import numpy as np
-import random
 import os
 import time
 import visCanvas as visC
+import visHeadless as visH
+import visExport
+import f1Telemetry as f1T
+import f1Fetch
 
 
 DATA_FOLDER = "./f1-data/"
@@ -30,7 +33,10 @@ REPLAY_MAP_INFO = {
 WIDTH = 640
 HEIGHT = 360
 FPS = 30
-TIMESCALE = 60
+TIMESCALE = 60 # replay seconds per real second to start with, arrow keys change it while playing
+SEEK_SECONDS = 30 # how far , and . jump
+EXPORT_PATH = None # eg "replay.mp4" or "replay.gif" to save the replay instead of showing it
+PARALLEL_EXPORT = True # split the export across every core
 ### CODE END
 
 def read_file(filePath):
@@ -111,40 +117,6 @@ def get_values_by_key(dictArr, key) -> list:
         arr.append(vals[key])
     return arr
 
-def parse_time(p):
-    return datetime.fromisoformat(p["date"])
-
-def get_data_per_interval(data, startTime, location=True):
-    data.sort(key=parse_time)
-
-    t = startTime
-    result = []
-
-    for val in data:
-        dateTimeVal = datetime.fromisoformat(val['date'])
-        if location:
-            if val['x'] == 0 and val['y'] == 0 and val['z'] == 0:
-                # invalid value
-                pass
-        if dateTimeVal >= t:
-            result.append(val)
-            while dateTimeVal >= t:
-                t += timedelta(milliseconds=100)
-
-    return result
-
-def transform_locations(coords, maxCoords, minCoords, newScale):
-    newLoc = []
-
-    xScale = newScale[0]/(maxCoords[0] - minCoords[0])
-    yScale = newScale[1]/(maxCoords[1] - minCoords[1])
-
-    # scale:
-    # (a - minA) * newScale/(maxA - minA)
-    newLoc.append((coords[0] - minCoords[0]) * xScale)
-    newLoc.append((coords[1] - minCoords[1]) * yScale)
-
-    return newLoc
 
 
 # --- get session info ---
@@ -189,54 +161,35 @@ print("Got driver info")
 # --- get each driver's locations ---
 startTime = datetime.fromisoformat(sessionData[raceIdx]['date_start'])
 endTime = datetime.fromisoformat(sessionData[raceIdx]['date_end'])
+sessionPrefix = DATA_FOLDER+"m"+str(meeting_key)+"_s"+str(session_key)
+locTablePath = sessionPrefix+"_locs.npy"
+
+locTable = f1T.load_table(locTablePath)
+if locTable is None:
+    # no binary cache yet, try converting the old text files first
+    locTable = f1T.migrate_text_cache(sessionPrefix, driverNums, locTablePath)
+if locTable is None:
+    # finished windows are kept in the folder, so rerunning after an interruption resumes
+    fetcher = f1Fetch.OpenF1Fetcher(sessionPrefix+"_windows/")
+    locTable = fetcher.fetch_location_table(meeting_key, session_key, driverNums, startTime, endTime, locTablePath) # Go by 3 minute intervals
+
 driverLocData = {}
 for dNum in driverNums:
-    driverLocs = read_file(DATA_FOLDER+"m"+str(meeting_key)+"_s"+str(session_key)+"_d"+str(dNum)+"_locs.txt")
-    if driverLocs == -1:
-        print("Fetching data for driver "+str(dNum))
-        # doesn't exist, get data
-        driverLocs = []
-        t = startTime
-        while t < endTime:
-            t2 = t + timedelta(minutes=3) # Go by 3 minute intervals
-
-            driverLocs += fetch_data("location?meeting_key="+str(meeting_key)+"&session_key="+str(session_key)+"&driver_number="+str(dNum)+"&date>="+t.replace(tzinfo=None).isoformat()+"&date<="+t2.replace(tzinfo=None).isoformat())
-
-            t = t2
-            time.sleep(0.5)
-    
-        filteredData = get_data_per_interval(driverLocs, startTime, location=True)
-        driverLocData[dNum] = filteredData
-        file = open(DATA_FOLDER+"m"+str(meeting_key)+"_s"+str(session_key)+"_d"+str(dNum)+"_locs.txt", "w")
-        file.write(str(filteredData))
-        file.close()
-        time.sleep(5)
-        print("Finished fectching data for driver "+str(dNum)+"\n")
-    else:
-        driverLocData[dNum] = eval(driverLocs)
+    driverLocData[dNum] = locTable.get_driver(dNum)
 
 print("Got driver location")
 
 # --- get the track dimensions ---
 # TODO add track image?
-# pick random 5 drivers, get the max and min coords of all locations
-tempDNums = random.choices(driverNums, k=5)
-tempDLocs = []
-for t in tempDNums:
-    tempDLocs += driverLocData[t]
-
-tempXVals = [p["x"] for p in tempDLocs]
-tempYVals = [p["y"] for p in tempDLocs]
-tempZVals = [p["z"] for p in tempDLocs]
+MAXCOORDS = [int(locTable.data[key].max()) for key in ["x", "y", "z"]]
+MINCOORDS = [int(locTable.data[key].min()) for key in ["x", "y", "z"]]
 
-MAXCOORDS = [max(tempXVals), max(tempYVals), max(tempZVals)]
-MINCOORDS = [min(tempXVals), min(tempYVals), min(tempZVals)]
-
-del tempDNums
-del tempDLocs
-del tempXVals
-del tempYVals
-del tempZVals
+# transform every sample to screen coordinates once
+MAP_MATRIX = f1T.map_matrix(MINCOORDS, MAXCOORDS, [REPLAY_MAP_INFO["map-width"], REPLAY_MAP_INFO['map-height']], [REPLAY_MAP_INFO["map-x-offset"], REPLAY_MAP_INFO["map-y-offset"]])
+mapPoints = f1T.apply_transform(MAP_MATRIX, locTable.data["x"], locTable.data["y"])
+driverMapPoints = {}
+for dNum in driverNums:
+    driverMapPoints[dNum] = mapPoints[locTable.driverSlices.get(dNum, slice(0, 0))]
 
 print("Got track info")
 
@@ -257,7 +210,7 @@ print("Got track info")
 #             t = t2
 #             time.sleep(0.5)
     
-#         filteredData = get_data_per_interval(driverPos, startTime, location=False)
+#         filteredData = f1T.resample_records(driverPos, startTime, 100, ["driver_number", "position"])
 #         driverPosData[dNum] = filteredData
 #         file = open(DATA_FOLDER+"m"+str(meeting_key)+"_s"+str(session_key)+"_d"+str(dNum)+"_positions.txt", "w")
 #         file.write(str(filteredData))
@@ -269,12 +222,16 @@ print("Got track info")
 
 
 # --- VISUALS ---
-root = tk.Tk()
+if EXPORT_PATH is None:
+    root = tk.Tk()
 
-canvas = tk.Canvas(root, width=WIDTH, height=HEIGHT, bg="#000")
-canvas.pack()
+    canvas = tk.Canvas(root, width=WIDTH, height=HEIGHT, bg="#000")
+    canvas.pack()
+else:
+    # drawn offscreen, no window needed
+    canvas = visH.ImageCanvas(WIDTH, HEIGHT, bg="#000")
 
-cv = visC.VisCanvas(canvas, WIDTH, HEIGHT)
+cv = visC.VisCanvas(canvas, WIDTH, HEIGHT, arrayEngine=True)
 
 ### CODE START -- initial setup
 
@@ -306,23 +263,28 @@ f1RaceSubtitle.change_text(subtitle, 30)
 
 timeText = visC.Text("", REPLAY_MAP_INFO["subtitle-width"], 25, HEIGHT-50, color="#FFF", maxSize=20)
 cv.add_sprite(timeText, "race-info")
+
+# --- replay clock, keyframes every 10 replay seconds keep seeks short anywhere in the race ---
+driverLocCursor = f1T.cursor_from_table(locTable, driverNums)
+timeline = f1T.ReplayTimeline(driverLocCursor, f1T.to_ns(startTime), f1T.to_ns(endTime), TIMESCALE)
+
+# dragging seeks at most 10 times a second
+timelineSlider = visC.HorizontalSlider("#333", "#333", "#FFF", "#FFF", WIDTH-50, 10, 25, HEIGHT-20, onChange=lambda val: move_to_time(timeline.seek_progress(val)), changeDelay=0.1)
+cv.add_sprite(timelineSlider, "race-info")
+
 # --- make driver location + position dots
 driverLocDots = {}
-driverLocTime = {}
-driverLocIdx = {}
 driverPosDots = {}
 dPos = 0
 for dNum in driverNums:
     dIdx = driverNums.index(dNum)
 
     # add location dot
-    dLoc = transform_locations([driverLocData[dNum][0]['x'], driverLocData[dNum][0]['y']], MAXCOORDS, MINCOORDS, [REPLAY_MAP_INFO["map-width"], REPLAY_MAP_INFO['map-height']])
-    dLocDot = visC.Dot("#"+driverData[dIdx]['team_colour'], "#000", REPLAY_MAP_INFO['dot-size'], dLoc[0]+REPLAY_MAP_INFO['map-x-offset'], dLoc[1]+REPLAY_MAP_INFO['map-y-offset'])
+    dLoc = driverMapPoints[dNum][driverLocCursor.get_index(dNum)]
+    dLocDot = visC.Dot("#"+driverData[dIdx]['team_colour'], "#000", REPLAY_MAP_INFO['dot-size'], dLoc[0], dLoc[1])
     
     cv.add_sprite(dLocDot, ["map-dot"])
     driverLocDots[dNum] = dLocDot
-    driverLocTime[dNum] = startTime
-    driverLocIdx[dNum] = 0
     
     # add position dot
     # dPos = driverPosData[dNum][0]['position']
@@ -346,14 +308,27 @@ currTime = startTime
 ### CODE END
 
 
+# called once per frame for each key pressed since the last frame
 def onKeyPress(event):
-    cv.update_keyboard_input(event.keysym)
-    
     ### CODE START - handle key presses
     # keyCodeText.change_text('You pressed %s\n' % event.keysym)
     # keyCodeText2.change_text(cv.get_text_input())
+    # space pauses, up and down double and halve the speed, r reverses, , and . jump back and forward
+    if event.keysym == "space":
+        timeline.paused = not timeline.paused
+    elif event.keysym == "Up":
+        timeline.set_rate(timeline.rate*2)
+    elif event.keysym == "Down":
+        timeline.set_rate(timeline.rate/2)
+    elif event.keysym == "r":
+        timeline.reverse()
+    elif event.keysym == "comma":
+        move_to_time(timeline.seek(timeline.timeNs - SEEK_SECONDS*10**9))
+    elif event.keysym == "period":
+        move_to_time(timeline.seek(timeline.timeNs + SEEK_SECONDS*10**9))
     ### CODE END
 
+# called once per frame for each click since the last frame
 def get_mouse_coords(event):
     global driverInfoText
     global driverData
@@ -362,10 +337,7 @@ def get_mouse_coords(event):
     global driverLocDots
     global driverPosDots
 
-    clickX = event.x
-    clickY = event.y
-
-    signals = cv.update_mouse_click(clickX, clickY)
+    signals = event.signals
     ### CODE START - handle mouse click
     if len(signals) > 0:
         dNum = int(signals[0])
@@ -386,43 +358,42 @@ def get_mouse_coords(event):
     ### CODE END
 
 
-def update():
+def move_to_time(changed):
+    '''
+    Shows the replay at the timeline's time, moving every driver whose sample changed
+    
+    :param changed: the driver numbers returned by the timeline
+    '''
     global currTime
-    global timeText
-    global driverNums
 
-    global driverLocDots
-    global driverLocTime
-    global driverLocIdx
-    ### CODE START - general update stuff
-    if currTime < endTime:
-        currTime += timedelta(milliseconds=int(1000/FPS))*TIMESCALE # update time
-
-        # -- TODO check if locations or positions need to be updated
-        for dNum in driverNums:
-            if driverLocTime[dNum] != endTime and driverLocTime[dNum] < currTime:
-                # Update!
-                while driverLocTime[dNum] < currTime:
-                    driverLocIdx[dNum] += 1
-                    if driverLocIdx[dNum] >= len(driverLocData[dNum]):
-                        driverLocIdx[dNum] = len(driverLocData[dNum])-1
-                        driverLocTime[dNum] = endTime
-                        break
-                    driverLocTime[dNum] = datetime.fromisoformat(driverLocData[dNum][driverLocIdx[dNum]]['date'])
-                dLoc = transform_locations([driverLocData[dNum][driverLocIdx[dNum]]['x'], driverLocData[dNum][driverLocIdx[dNum]]['y']], MAXCOORDS, MINCOORDS, [REPLAY_MAP_INFO["map-width"], REPLAY_MAP_INFO['map-height']])
-                driverLocDots[dNum].change_pos(dLoc[0]+REPLAY_MAP_INFO["map-x-offset"], dLoc[1]+REPLAY_MAP_INFO["map-y-offset"])#, duration=FPS)
-                
-        timeText.change_text(currTime.isoformat())
+    currTime = f1T.from_ns(timeline.timeNs)
+    for dNum in changed:
+        dLoc = driverMapPoints[dNum][driverLocCursor.get_index(dNum)]
+        driverLocDots[dNum].change_pos(dLoc[0], dLoc[1])#, duration=FPS)
 
-    ### CODE END
+    timeText.change_text(currTime.isoformat())
+    if not timelineSlider.isClicked:
+        timelineSlider.set_value(timeline.get_progress(), False)
 
-    cv.update()
+def update():
+    ### CODE START - general update stuff
+    if not timeline.paused and not timeline.is_finished():
+        move_to_time(timeline.advance(1/FPS)) # update time
 
-    # Schedule the next frame
-    canvas.after(int(1000/FPS), update)  # ~30 FPS
+    ### CODE END
 
-root.bind('<KeyPress>', onKeyPress)
-root.bind('<Button-1>', get_mouse_coords)
+if EXPORT_PATH is None:
+    cv.bind_input(root)
+    cv.add_input_listener("key", onKeyPress)
+    cv.add_input_listener("click", get_mouse_coords)
 
-update()
-root.mainloop()
\ No newline at end of file
+    # steps at a fixed FPS, calling update before each step
+    cv.run(FPS, update)
+    root.mainloop()
+else:
+    # one frame per step until the replay clock reaches the end of the session
+    frameCount = int(np.ceil((endTime-currTime).total_seconds()*FPS/TIMESCALE))
+    if PARALLEL_EXPORT:
+        visExport.export_parallel(cv, EXPORT_PATH, frameCount, FPS, update)
+    else:
+        visExport.export_video(cv, EXPORT_PATH, frameCount, FPS, update, progressEvery=FPS*60)
\ No newline at end of file
@@ -0,0 +1,326 @@
+'''
+Downloading from the OpenF1 api
+Requests run in parallel under a shared rate limit, failed requests are retried with backoff, and every finished time window is saved so an interrupted download picks up where it stopped
+'''
+
+
+import os
+import json
+import time
+import codecs
+import random
+import threading
+from datetime import datetime, timedelta
+from urllib.request import urlopen
+from urllib.error import HTTPError, URLError
+from http.client import IncompleteRead
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import f1Telemetry as f1T
+
+API_URL = "https://api.openf1.org/v1/"
+RETRY_CODES = [429, 500, 502, 503, 504]
+
+class TokenBucket():
+    def __init__(self, rate:float, burst:int=1):
+        '''
+        Sets up a thread safe token bucket rate limiter
+
+        :param self: n/a
+        :param rate: the number of tokens added per second
+        :type rate: float
+        :param burst: the most tokens that can be saved up
+        :type burst: int
+        '''
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.lastTime = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        '''
+        Waits until a token is available and uses it
+
+        :param self: n/a
+        '''
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now-self.lastTime)*self.rate)
+                self.lastTime = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                waitTime = (1-self.tokens)/self.rate
+            time.sleep(waitTime)
+
+def time_windows(startTime:datetime, endTime:datetime, minutes:int=3) -> list:
+    '''
+    Splits a time range into windows
+
+    :param startTime: the start of the range
+    :type startTime: datetime
+    :param endTime: the end of the range
+    :type endTime: datetime
+    :param minutes: the length of each window
+    :type minutes: int
+    :return: a list of (start, end) datetimes
+    :rtype: list
+    '''
+    windows = []
+    t = startTime
+    while t < endTime:
+        t2 = t + timedelta(minutes=minutes)
+        windows.append((t, t2))
+        t = t2
+    return windows
+
+class TruncatedResponse(ValueError):
+    '''
+    Raised when a response body ends before the JSON in it does, eg when the connection drops mid-body, so the request can be retried
+    '''
+
+def iter_json_array(stream, chunkSize:int=65536):
+    '''
+    Yields the elements of a JSON array one at a time while reading the stream in chunks, so the whole body is never in memory
+
+    :param stream: a binary file-like object, eg an http response
+    :param chunkSize: the number of bytes read at a time
+    :type chunkSize: int
+    '''
+    decoder = json.JSONDecoder()
+    textDecoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    pos = 0
+    started = False
+    ended = False
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+            pos += 1
+
+        if pos < len(buffer):
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("Expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                element, end = decoder.raw_decode(buffer, pos)
+                # an element touching the end of the buffer might continue in the next chunk
+                if end < len(buffer) or ended:
+                    yield element
+                    pos = end
+                    continue
+            except json.JSONDecodeError as e:
+                if ended:
+                    raise TruncatedResponse("JSON array ended early") from e
+        elif ended:
+            raise TruncatedResponse("JSON array ended early")
+
+        chunk = stream.read(chunkSize)
+        ended = len(chunk) == 0
+        buffer = buffer[pos:] + textDecoder.decode(chunk, final=ended)
+        pos = 0
+
+def stream_locations(stream, startNs:int, stepNs:int, chunkRows:int=4096) -> np.ndarray:
+    '''
+    Reads OpenF1 location samples from a stream straight into a location table, dropping invalid samples and all but the first sample in each time step as it goes
+
+    :param stream: a binary file-like object holding a JSON array of locations
+    :param startNs: the time the steps are counted from, in epoch nanoseconds
+    :type startNs: int
+    :param stepNs: the step length in nanoseconds
+    :type stepNs: int
+    :param chunkRows: the number of rows allocated at a time
+    :type chunkRows: int
+    :return: the location table, sorted by driver then date
+    :rtype: np.ndarray
+    '''
+    chunks = []
+    chunk = np.empty(chunkRows, dtype=f1T.LOCATION_DTYPE)
+    n = 0
+    lastBucket = -1
+    lastNs = -1
+    ordered = True
+    for rec in iter_json_array(stream):
+        if rec["x"] == 0 and rec["y"] == 0 and rec["z"] == 0:
+            # invalid value
+            continue
+        ns = f1T.to_ns(datetime.fromisoformat(rec["date"]))
+        if ns < startNs:
+            continue
+
+        bucket = (ns-startNs)//stepNs
+        if bucket == lastBucket and ns >= lastNs:
+            # a later sample in the same step
+            continue
+        if ns < lastNs:
+            ordered = False
+        lastBucket = bucket
+        lastNs = ns
+
+        chunk[n] = (ns, rec["driver_number"], rec["x"], rec["y"], rec["z"])
+        n += 1
+        if n == chunkRows:
+            chunks.append(chunk)
+            chunk = np.empty(chunkRows, dtype=f1T.LOCATION_DTYPE)
+            n = 0
+
+    chunks.append(chunk[:n])
+    table = np.concatenate(chunks)
+    if not ordered:
+        table = f1T.thin_table(f1T.sort_table(table), startNs, stepNs)
+    return table
+
+class OpenF1Fetcher():
+    def __init__(self, cacheFolder:str, baseUrl:str=API_URL, workers:int=4, rate:float=3, burst:int=3, retries:int=5, backoff:float=1):
+        '''
+        Sets up a fetcher
+
+        :param self: n/a
+        :param cacheFolder: the folder that finished windows are saved in
+        :type cacheFolder: str
+        :param baseUrl: the api url that request parameters are added to
+        :type baseUrl: str
+        :param workers: the number of requests that can run at once
+        :type workers: int
+        :param rate: the most requests started per second
+        :type rate: float
+        :param burst: the most requests that can start at once after being idle
+        :type burst: int
+        :param retries: the number of times a failed request is retried
+        :type retries: int
+        :param backoff: the wait in seconds before the first retry, doubling each retry
+        :type backoff: float
+        '''
+        self.cacheFolder = cacheFolder
+        self.baseUrl = baseUrl
+        self.workers = workers
+        self.limiter = TokenBucket(rate, burst)
+        self.retries = retries
+        self.backoff = backoff
+
+    def fetch_bytes(self, jsonValues:str) -> bytes:
+        '''
+        Fetches the raw response body for the given parameters
+
+        :param self: n/a
+        :param jsonValues: the parameters, eg "drivers?driverNum=1"
+        :type jsonValues: str
+        :return: the response body
+        :rtype: bytes
+        '''
+        return self.fetch_with(jsonValues, lambda response: response.read())
+
+    def fetch_with(self, jsonValues:str, reader):
+        '''
+        Opens a request for the given parameters and hands the response to reader, retrying on rate limits, server errors and dropped connections, including ones that drop while reader is reading
+
+        :param self: n/a
+        :param jsonValues: the parameters, eg "drivers?driverNum=1"
+        :type jsonValues: str
+        :param reader: a function that takes the response and returns the result
+        :return: what reader returns
+        '''
+        attempt = 0
+        while True:
+            self.limiter.take()
+            try:
+                with urlopen(self.baseUrl+jsonValues, timeout=60) as response:
+                    return reader(response)
+            except HTTPError as e:
+                if e.code not in RETRY_CODES or attempt >= self.retries:
+                    raise
+            except (URLError, TimeoutError, ConnectionError, IncompleteRead, json.JSONDecodeError, TruncatedResponse):
+                if attempt >= self.retries:
+                    raise
+            time.sleep(self.backoff * 2**attempt * random.uniform(0.5, 1.5))
+            attempt += 1
+
+    def fetch_json(self, jsonValues:str):
+        '''
+        Fetches and parses the data for the given parameters
+
+        :param self: n/a
+        :param jsonValues: the parameters, eg "drivers?driverNum=1"
+        :type jsonValues: str
+        :return: the fetched data
+        '''
+        print("Fetching data for "+jsonValues)
+        # parsed inside the request so a cut off body is retried
+        return self.fetch_with(jsonValues, lambda response: json.loads(response.read().decode("utf-8")))
+
+    def download(self, jobs:list):
+        '''
+        Runs every (fileName, jsonValues, save) job that isn't already saved, several at a time
+
+        :param self: n/a
+        :param jobs: a list of (fileName, jsonValues, save) tuples where save takes the response and the file path to write
+        :type jobs: list
+        '''
+        os.makedirs(self.cacheFolder, exist_ok=True)
+        todo = [job for job in jobs if not os.path.exists(os.path.join(self.cacheFolder, job[0]))]
+        if len(todo) == 0:
+            return
+        print("Downloading "+str(len(todo))+" of "+str(len(jobs))+" windows")
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for _ in pool.map(self.download_job, todo):
+                pass
+
+    def download_job(self, job:tuple):
+        '''
+        Downloads one job and saves it. save must only create the file once it is fully written
+
+        :param self: n/a
+        :param job: a (fileName, jsonValues, save) tuple
+        :type job: tuple
+        '''
+        fileName, jsonValues, save = job
+        filePath = os.path.join(self.cacheFolder, fileName)
+        self.fetch_with(jsonValues, lambda response: save(response, filePath))
+
+    def fetch_location_table(self, meetingKey:int, sessionKey:int, driverNums:list, startTime:datetime, endTime:datetime, filePath:str, stepMs:int=100, minutes:int=3):
+        '''
+        Streams every driver's locations for a session into a location table file, one time window per request
+
+        :param self: n/a
+        :param meetingKey: the meeting key
+        :type meetingKey: int
+        :param sessionKey: the session key
+        :type sessionKey: int
+        :param driverNums: the drivers to fetch
+        :type driverNums: list
+        :param startTime: the start of the session
+        :type startTime: datetime
+        :param endTime: the end of the session
+        :type endTime: datetime
+        :param filePath: the session .npy file to write
+        :type filePath: str
+        :param stepMs: only the first sample in each step of this many milliseconds is kept
+        :type stepMs: int
+        :param minutes: the length of each request window
+        :type minutes: int
+        :return: the saved TelemetryTable
+        '''
+        startNs = f1T.to_ns(startTime)
+        stepNs = stepMs*1000000
+
+        def save(response, windowPath):
+            f1T.save_table(windowPath, stream_locations(response, startNs, stepNs))
+
+        jobs = []
+        for dNum in driverNums:
+            for idx, (t, t2) in enumerate(time_windows(startTime, endTime, minutes)):
+                fileName = "d"+str(dNum)+"_w"+str(idx)+".npy"
+                jsonValues = "location?meeting_key="+str(meetingKey)+"&session_key="+str(sessionKey)+"&driver_number="+str(dNum)+"&date>="+t.replace(tzinfo=None).isoformat()+"&date<="+t2.replace(tzinfo=None).isoformat()
+                jobs.append((fileName, jsonValues, save))
+
+        self.download(jobs)
+
+        f1T.write_merged_table([os.path.join(self.cacheFolder, job[0]) for job in jobs], filePath, startNs, stepNs)
+        return f1T.load_table(filePath)
@@ -0,0 +1,115 @@
+'''
+Resampling telemetry onto a fixed rate
+Works on numeric epoch nanosecond timestamps with NumPy, so each pass is linear in the number of samples
+'''
+
+
+import numpy as np
+
+POLICIES = ["first", "last", "mean", "interp"]
+
+def run_starts(buckets:np.ndarray, groups:np.ndarray=None) -> np.ndarray:
+    '''
+    Marks the first sample of each run of equal buckets
+
+    :param buckets: the bucket of each sample, sorted within each group
+    :type buckets: np.ndarray
+    :param groups: optional group of each sample, eg the driver number, so runs don't cross groups
+    :type groups: np.ndarray
+    :return: a boolean mask of run starts
+    :rtype: np.ndarray
+    '''
+    starts = np.ones(len(buckets), dtype=bool)
+    starts[1:] = buckets[1:] != buckets[:-1]
+    if groups is not None:
+        starts[1:] |= groups[1:] != groups[:-1]
+    return starts
+
+def run_ends(buckets:np.ndarray, groups:np.ndarray=None) -> np.ndarray:
+    '''
+    Marks the last sample of each run of equal buckets
+
+    :param buckets: the bucket of each sample, sorted within each group
+    :type buckets: np.ndarray
+    :param groups: optional group of each sample, eg the driver number, so runs don't cross groups
+    :type groups: np.ndarray
+    :return: a boolean mask of run ends
+    :rtype: np.ndarray
+    '''
+    ends = np.ones(len(buckets), dtype=bool)
+    ends[:-1] = run_starts(buckets, groups)[1:]
+    return ends
+
+def location_mask(x:np.ndarray, y:np.ndarray, z:np.ndarray) -> np.ndarray:
+    '''
+    Marks location samples that aren't the invalid (0, 0, 0) value
+
+    :param x: the x coordinates
+    :type x: np.ndarray
+    :param y: the y coordinates
+    :type y: np.ndarray
+    :param z: the z coordinates
+    :type z: np.ndarray
+    :return: a boolean mask of valid samples
+    :rtype: np.ndarray
+    '''
+    return (np.asarray(x) != 0) | (np.asarray(y) != 0) | (np.asarray(z) != 0)
+
+def resample(times:np.ndarray, columns:dict, startNs:int, stepNs:int, policy:str="first", valid:np.ndarray=None) -> tuple:
+    '''
+    Resamples columns onto fixed steps counted from startNs. Samples before startNs and samples marked invalid are dropped
+
+    first and last keep one real sample per step, with its own time. mean averages each step's samples and interp interpolates at each step's start, and both use the step start times
+
+    :param times: the sample times in epoch nanoseconds
+    :type times: np.ndarray
+    :param columns: the value arrays to resample, by name
+    :type columns: dict
+    :param startNs: the time the steps are counted from, in epoch nanoseconds
+    :type startNs: int
+    :param stepNs: the step length in nanoseconds
+    :type stepNs: int
+    :param policy: one of "first", "last", "mean" or "interp"
+    :type policy: str
+    :param valid: optional boolean mask of samples to use
+    :type valid: np.ndarray
+    :return: the new times and the new columns
+    :rtype: tuple
+    '''
+    if policy not in POLICIES:
+        raise ValueError("Unknown resample policy "+str(policy))
+
+    times = np.asarray(times, dtype=np.int64)
+    columns = {key: np.asarray(vals) for key, vals in columns.items()}
+    keep = times >= startNs
+    if valid is not None:
+        keep &= np.asarray(valid, dtype=bool)
+    times = times[keep]
+    columns = {key: vals[keep] for key, vals in columns.items()}
+
+    if len(times) > 1 and np.any(times[1:] < times[:-1]):
+        order = np.argsort(times, kind="stable")
+        times = times[order]
+        columns = {key: vals[order] for key, vals in columns.items()}
+
+    if len(times) == 0:
+        return times, columns
+
+    buckets = (times-startNs)//stepNs
+    if policy == "first":
+        picked = run_starts(buckets)
+        return times[picked], {key: vals[picked] for key, vals in columns.items()}
+    if policy == "last":
+        picked = run_ends(buckets)
+        return times[picked], {key: vals[picked] for key, vals in columns.items()}
+
+    if policy == "mean":
+        starts = np.flatnonzero(run_starts(buckets))
+        counts = np.diff(np.append(starts, len(times)))
+        newTimes = startNs + buckets[starts]*stepNs
+        return newTimes, {key: np.add.reduceat(vals.astype(np.float64), starts)/counts for key, vals in columns.items()}
+
+    # interp
+    newTimes = startNs + np.arange(buckets[0], buckets[-1]+1, dtype=np.int64)*stepNs
+    newTimes = newTimes[(newTimes >= times[0]) & (newTimes <= times[-1])]
+    return newTimes, {key: np.interp(newTimes, times, vals.astype(np.float64)) for key, vals in columns.items()}
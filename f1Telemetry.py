@@ -0,0 +1,599 @@
+'''
+Telemetry storage for F1 replays
+Location samples are kept as typed columns in one NumPy file per session, so reopening a race is a memory map instead of a text parse
+'''
+
+
+import os
+import ast
+from datetime import datetime, timezone, timedelta
+import numpy as np
+import f1Resample
+
+LOCATION_DTYPE = np.dtype([
+    ("date", "<i8"), # epoch nanoseconds, UTC
+    ("driver_number", "<i4"),
+    ("x", "<i4"),
+    ("y", "<i4"),
+    ("z", "<i4"),
+])
+
+def to_ns(dateTime:datetime) -> int:
+    '''
+    Converts a datetime to epoch nanoseconds
+
+    :param dateTime: the datetime, assumed UTC if it has no timezone
+    :type dateTime: datetime
+    :return: nanoseconds since the epoch
+    :rtype: int
+    '''
+    if dateTime.tzinfo is None:
+        dateTime = dateTime.replace(tzinfo=timezone.utc)
+    delta = dateTime - datetime(1970, 1, 1, tzinfo=timezone.utc)
+    return (delta.days*86400 + delta.seconds)*1000000000 + delta.microseconds*1000
+
+def from_ns(ns:int) -> datetime:
+    '''
+    Converts epoch nanoseconds to a UTC datetime
+
+    :param ns: nanoseconds since the epoch
+    :type ns: int
+    :return: the datetime
+    :rtype: datetime
+    '''
+    return datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(microseconds=int(ns)//1000)
+
+def parse_dates(dates:list) -> np.ndarray:
+    '''
+    Parses ISO date strings into epoch nanoseconds
+
+    :param dates: the date strings, eg "2023-09-16T13:03:35.292000+00:00"
+    :type dates: list
+    :return: the dates as int64 nanoseconds
+    :rtype: np.ndarray
+    '''
+    if all(date.endswith("+00:00") for date in dates):
+        # numpy parses naive ISO strings in C
+        return np.array([date[:-6] for date in dates], dtype="datetime64[ns]").astype(np.int64)
+    return np.array([to_ns(datetime.fromisoformat(date)) for date in dates], dtype=np.int64)
+
+def records_to_table(records:list) -> np.ndarray:
+    '''
+    Converts OpenF1 location dictionaries into a location table
+
+    :param records: the location dictionaries
+    :type records: list
+    :return: a structured array with LOCATION_DTYPE, sorted by driver then date
+    :rtype: np.ndarray
+    '''
+    table = np.empty(len(records), dtype=LOCATION_DTYPE)
+    if len(records) == 0:
+        return table
+    table["date"] = parse_dates([rec["date"] for rec in records])
+    for key in ["driver_number", "x", "y", "z"]:
+        table[key] = [rec[key] for rec in records]
+    return sort_table(table)
+
+def sort_table(table:np.ndarray) -> np.ndarray:
+    '''
+    Sorts a location table by driver then date
+
+    :param table: the location table
+    :type table: np.ndarray
+    :return: the sorted table
+    :rtype: np.ndarray
+    '''
+    order = np.lexsort((table["date"], table["driver_number"]))
+    return table[order]
+
+def save_table(filePath:str, table:np.ndarray):
+    '''
+    Writes a location table to disk, replacing any existing file only once the write has finished
+
+    :param filePath: the .npy file path
+    :type filePath: str
+    :param table: the location table
+    :type table: np.ndarray
+    '''
+    tempPath = filePath+".part"
+    with open(tempPath, "wb") as file:
+        np.save(file, np.ascontiguousarray(table, dtype=LOCATION_DTYPE))
+    os.replace(tempPath, filePath)
+
+class TelemetryTable():
+    def __init__(self, data:np.ndarray):
+        '''
+        Wraps a location table sorted by driver then date
+
+        :param self: n/a
+        :param data: the structured array, possibly memory mapped
+        :type data: np.ndarray
+        '''
+        self.data = data
+
+        # where each driver's block starts and ends
+        driverCol = data["driver_number"]
+        if len(data) > 0:
+            starts = np.flatnonzero(driverCol[1:] != driverCol[:-1])+1
+            starts = np.concatenate(([0], starts))
+        else:
+            starts = np.zeros(0, dtype=np.int64)
+        ends = np.append(starts[1:], len(data))
+        self.driverSlices = {}
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            self.driverSlices[int(driverCol[start])] = slice(start, end)
+
+    def __len__(self):
+        return len(self.data)
+
+    def get_drivers(self) -> list:
+        '''
+        Gets the driver numbers that have samples
+
+        :param self: n/a
+        :return: the driver numbers
+        :rtype: list
+        '''
+        return list(self.driverSlices.keys())
+
+    def get_driver(self, driverNum:int) -> np.ndarray:
+        '''
+        Gets one driver's samples without copying
+
+        :param self: n/a
+        :param driverNum: the driver number
+        :type driverNum: int
+        :return: a view of the driver's rows, empty if the driver has no samples
+        :rtype: np.ndarray
+        '''
+        return self.data[self.driverSlices.get(int(driverNum), slice(0, 0))]
+
+def load_table(filePath:str):
+    '''
+    Opens a saved location table as a memory map
+
+    :param filePath: the .npy file path
+    :type filePath: str
+    :return: the TelemetryTable, or None if the file doesn't exist
+    '''
+    if not os.path.exists(filePath):
+        return None
+    return TelemetryTable(np.load(filePath, mmap_mode="r"))
+
+def migrate_text_cache(filePrefix:str, driverNums:list, filePath:str):
+    '''
+    Converts the old per-driver "_locs.txt" files into a single location table. The text files are left in place
+
+    :param filePrefix: the start of the old file paths, eg "./f1-data/m1208_s9078"
+    :type filePrefix: str
+    :param driverNums: the drivers to look for
+    :type driverNums: list
+    :param filePath: the .npy file to write
+    :type filePath: str
+    :return: the new TelemetryTable, or None if any driver's text file is missing
+    '''
+    records = []
+    for dNum in driverNums:
+        textPath = filePrefix+"_d"+str(dNum)+"_locs.txt"
+        if not os.path.exists(textPath):
+            return None
+        print("Migrating "+textPath)
+        with open(textPath, "r") as file:
+            driverRecords = ast.literal_eval(file.read())
+        for rec in driverRecords:
+            rec["driver_number"] = dNum
+        records += driverRecords
+
+    table = records_to_table(records)
+    table = table[f1Resample.location_mask(table["x"], table["y"], table["z"])]
+    save_table(filePath, table)
+    return load_table(filePath)
+
+class ReplayCursor():
+    def __init__(self, timesByDriver:dict):
+        '''
+        Tracks each driver's current sample during a replay. Sample times are numeric and sorted, so finding the current sample is a binary search
+
+        :param self: n/a
+        :param timesByDriver: a sorted array of epoch nanosecond sample times for each driver number
+        :type timesByDriver: dict
+        '''
+        self.times = {}
+        self.indices = {}
+        self.finished = {}
+        for dNum, times in timesByDriver.items():
+            self.times[dNum] = np.ascontiguousarray(times, dtype=np.int64)
+            self.indices[dNum] = 0
+            self.finished[dNum] = len(times) == 0
+        self.timeNs = None
+
+        self.keyframeTimes = None
+        self.keyframes = {}
+
+    def add_keyframes(self, startNs:int, endNs:int, stepNs:int):
+        '''
+        Snapshots every driver's sample index at fixed steps, so a seek only has to search the samples between two snapshots
+
+        :param self: n/a
+        :param startNs: the time of the first snapshot in epoch nanoseconds
+        :type startNs: int
+        :param endNs: the time the last snapshot has to reach in epoch nanoseconds
+        :type endNs: int
+        :param stepNs: the time between snapshots in nanoseconds
+        :type stepNs: int
+        '''
+        count = max(1, -(-(endNs-startNs)//stepNs))
+        self.keyframeTimes = startNs + np.arange(count+1, dtype=np.int64)*stepNs
+        self.keyframes = {}
+        for dNum, times in self.times.items():
+            self.keyframes[dNum] = np.searchsorted(times, self.keyframeTimes, side="left")
+
+    def get_search_range(self, timeNs:int) -> tuple:
+        '''
+        Gets the keyframes on either side of a time
+
+        :param self: n/a
+        :param timeNs: the replay time in epoch nanoseconds
+        :type timeNs: int
+        :return: the keyframe numbers before and after the time, or None if the time isn't between two keyframes
+        :rtype: tuple
+        '''
+        if self.keyframeTimes is None or timeNs < self.keyframeTimes[0] or timeNs > self.keyframeTimes[-1]:
+            return None
+        startNs = int(self.keyframeTimes[0])
+        stepNs = int(self.keyframeTimes[1]-self.keyframeTimes[0])
+        before = min((timeNs-startNs)//stepNs, len(self.keyframeTimes)-2)
+        return before, before+1
+
+    def seek(self, timeNs:int) -> list:
+        '''
+        Moves every driver to their first sample at or after the given time, or their last sample if the time is past the end
+
+        :param self: n/a
+        :param timeNs: the replay time in epoch nanoseconds
+        :type timeNs: int
+        :return: the driver numbers whose current sample changed
+        :rtype: list
+        '''
+        self.timeNs = timeNs
+        changed = []
+        searchRange = self.get_search_range(timeNs)
+        for dNum, times in self.times.items():
+            if len(times) == 0:
+                continue
+            if searchRange is None:
+                idx = int(np.searchsorted(times, timeNs, side="left"))
+            else:
+                # every sample before the first keyframe index is earlier than the time, and the one at the second isn't
+                low = int(self.keyframes[dNum][searchRange[0]])
+                high = int(self.keyframes[dNum][searchRange[1]])
+                idx = low + int(np.searchsorted(times[low:high], timeNs, side="left"))
+            self.finished[dNum] = idx >= len(times)
+            if self.finished[dNum]:
+                idx = len(times)-1
+            if idx != self.indices[dNum]:
+                self.indices[dNum] = idx
+                changed.append(dNum)
+        return changed
+
+    def get_index(self, driverNum:int) -> int:
+        '''
+        Gets a driver's current sample index
+
+        :param self: n/a
+        :param driverNum: the driver number
+        :type driverNum: int
+        :return: the index into the driver's samples
+        :rtype: int
+        '''
+        return self.indices[driverNum]
+
+def cursor_from_table(table:TelemetryTable, driverNums:list) -> ReplayCursor:
+    '''
+    Makes a replay cursor over the drivers in a location table
+
+    :param table: the location table
+    :type table: TelemetryTable
+    :param driverNums: the drivers to follow
+    :type driverNums: list
+    :return: the cursor, positioned on each driver's first sample
+    :rtype: ReplayCursor
+    '''
+    timesByDriver = {}
+    for dNum in driverNums:
+        timesByDriver[dNum] = table.get_driver(dNum)["date"]
+    return ReplayCursor(timesByDriver)
+
+class ReplayTimeline():
+    def __init__(self, cursor:ReplayCursor, startNs:int, endNs:int, rate:float=1, keyframeSeconds:float=10):
+        '''
+        Keeps the replay clock, which can jump to any time, play forwards or backwards, and change speed while playing
+
+        :param self: n/a
+        :param cursor: the cursor to move, given keyframes between startNs and endNs
+        :type cursor: ReplayCursor
+        :param startNs: the start of the replay in epoch nanoseconds
+        :type startNs: int
+        :param endNs: the end of the replay in epoch nanoseconds
+        :type endNs: int
+        :param rate: replay seconds per real second, negative plays backwards
+        :type rate: float
+        :param keyframeSeconds: the replay seconds between keyframes
+        :type keyframeSeconds: float
+        '''
+        self.cursor = cursor
+        self.startNs = startNs
+        self.endNs = max(startNs, endNs)
+        self.rate = rate
+        self.paused = False
+
+        self.cursor.add_keyframes(self.startNs, self.endNs, max(1, round(keyframeSeconds*1e9)))
+        self.timeNs = self.startNs
+        self.cursor.seek(self.timeNs)
+
+    def seek(self, timeNs:int) -> list:
+        '''
+        Jumps to a time, kept within the replay
+
+        :param self: n/a
+        :param timeNs: the replay time in epoch nanoseconds
+        :type timeNs: int
+        :return: the driver numbers whose current sample changed
+        :rtype: list
+        '''
+        self.timeNs = min(max(int(timeNs), self.startNs), self.endNs)
+        return self.cursor.seek(self.timeNs)
+
+    def seek_progress(self, fraction:float) -> list:
+        '''
+        Jumps to a fraction of the way through the replay
+
+        :param self: n/a
+        :param fraction: 0 for the start to 1 for the end
+        :type fraction: float
+        :return: the driver numbers whose current sample changed
+        :rtype: list
+        '''
+        return self.seek(self.startNs + round(fraction*(self.endNs-self.startNs)))
+
+    def advance(self, seconds:float) -> list:
+        '''
+        Plays the replay for some real time at the current rate
+
+        :param self: n/a
+        :param seconds: the real seconds that passed
+        :type seconds: float
+        :return: the driver numbers whose current sample changed
+        :rtype: list
+        '''
+        if self.paused or self.is_finished():
+            return []
+        return self.seek(self.timeNs + round(seconds*self.rate*1e9))
+
+    def set_rate(self, rate:float):
+        '''
+        Changes the replay speed from the current time on
+
+        :param self: n/a
+        :param rate: replay seconds per real second, negative plays backwards
+        :type rate: float
+        '''
+        self.rate = rate
+
+    def reverse(self):
+        '''
+        Flips the direction the replay plays in
+
+        :param self: n/a
+        '''
+        self.rate = -self.rate
+
+    def get_progress(self) -> float:
+        '''
+        Gets how far through the replay the clock is
+
+        :param self: n/a
+        :return: 0 at the start to 1 at the end
+        :rtype: float
+        '''
+        if self.endNs == self.startNs:
+            return 1
+        return (self.timeNs-self.startNs)/(self.endNs-self.startNs)
+
+    def is_finished(self) -> bool:
+        '''
+        Checks if the replay has reached the end it is playing towards
+
+        :param self: n/a
+        :return: true at the end when playing forwards or at the start when playing backwards
+        :rtype: bool
+        '''
+        if self.rate > 0:
+            return self.timeNs >= self.endNs
+        if self.rate < 0:
+            return self.timeNs <= self.startNs
+        return True
+
+def translation_matrix(tX:float, tY:float) -> np.ndarray:
+    '''
+    Makes an affine matrix that moves points
+
+    :param tX: the x offset
+    :type tX: float
+    :param tY: the y offset
+    :type tY: float
+    :return: a 3x3 affine matrix
+    :rtype: np.ndarray
+    '''
+    return np.array([[1, 0, tX], [0, 1, tY], [0, 0, 1]], dtype=np.float64)
+
+def scale_matrix(sX:float, sY:float) -> np.ndarray:
+    '''
+    Makes an affine matrix that scales points about the origin
+
+    :param sX: the x scale
+    :type sX: float
+    :param sY: the y scale
+    :type sY: float
+    :return: a 3x3 affine matrix
+    :rtype: np.ndarray
+    '''
+    return np.array([[sX, 0, 0], [0, sY, 0], [0, 0, 1]], dtype=np.float64)
+
+def rotation_matrix(degrees:float, cX:float=0, cY:float=0) -> np.ndarray:
+    '''
+    Makes an affine matrix that rotates points about a center
+
+    :param degrees: the rotation angle
+    :type degrees: float
+    :param cX: the x coordinate of the center
+    :type cX: float
+    :param cY: the y coordinate of the center
+    :type cY: float
+    :return: a 3x3 affine matrix
+    :rtype: np.ndarray
+    '''
+    angle = np.radians(degrees)
+    rotation = np.array([
+        [np.cos(angle), -np.sin(angle), 0],
+        [np.sin(angle),  np.cos(angle), 0],
+        [0, 0, 1]
+    ])
+    return translation_matrix(cX, cY) @ rotation @ translation_matrix(-cX, -cY)
+
+def map_matrix(minCoords:list, maxCoords:list, mapSize:list, offset:list=[0, 0]) -> np.ndarray:
+    '''
+    Makes the affine matrix that fits track coordinates into a map box
+
+    :param minCoords: the smallest [x, y] track coordinates
+    :type minCoords: list
+    :param maxCoords: the largest [x, y] track coordinates
+    :type maxCoords: list
+    :param mapSize: the [width, height] of the map on screen
+    :type mapSize: list
+    :param offset: the [x, y] screen position of the map's corner
+    :type offset: list
+    :return: a 3x3 affine matrix
+    :rtype: np.ndarray
+    '''
+    # scale:
+    # (a - minA) * newScale/(maxA - minA) + offset
+    return translation_matrix(offset[0], offset[1]) @ scale_matrix(mapSize[0]/(maxCoords[0]-minCoords[0]), mapSize[1]/(maxCoords[1]-minCoords[1])) @ translation_matrix(-minCoords[0], -minCoords[1])
+
+def apply_transform(matrix:np.ndarray, x:np.ndarray, y:np.ndarray) -> np.ndarray:
+    '''
+    Transforms many points with one affine matrix
+
+    :param matrix: a 3x3 affine matrix
+    :type matrix: np.ndarray
+    :param x: the x coordinates
+    :type x: np.ndarray
+    :param y: the y coordinates
+    :type y: np.ndarray
+    :return: an (n, 2) array of transformed [x, y] points
+    :rtype: np.ndarray
+    '''
+    points = np.empty((len(x), 2), dtype=np.float64)
+    points[:, 0] = x
+    points[:, 1] = y
+    return points @ matrix[:2, :2].T + matrix[:2, 2]
+
+def thin_table(table:np.ndarray, startNs:int, stepNs:int, lastBuckets:dict=None) -> np.ndarray:
+    '''
+    Keeps only the first sample in each time step for each driver, dropping samples before the start
+
+    :param table: a location table sorted by driver then date
+    :type table: np.ndarray
+    :param startNs: the time the steps are counted from, in epoch nanoseconds
+    :type startNs: int
+    :param stepNs: the step length in nanoseconds
+    :type stepNs: int
+    :param lastBuckets: optional last kept step for each driver from an earlier table, updated in place
+    :type lastBuckets: dict
+    :return: the thinned table
+    :rtype: np.ndarray
+    '''
+    table = table[table["date"] >= startNs]
+    if len(table) == 0:
+        return table
+    buckets = (table["date"]-startNs)//stepNs
+    drivers = table["driver_number"]
+    keep = f1Resample.run_starts(buckets, drivers)
+
+    if lastBuckets is not None:
+        for dNum in np.unique(drivers).tolist():
+            if dNum in lastBuckets:
+                keep &= ~((drivers == dNum) & (buckets <= lastBuckets[dNum]))
+            lastBuckets[dNum] = int(buckets[drivers == dNum].max())
+    return table[keep]
+
+def write_merged_table(windowPaths:list, filePath:str, startNs:int, stepNs:int):
+    '''
+    Joins saved window tables into one session table, one window in memory at a time
+
+    :param windowPaths: the window .npy files, ordered by driver then time
+    :type windowPaths: list
+    :param filePath: the session .npy file to write
+    :type filePath: str
+    :param startNs: the time the steps are counted from, in epoch nanoseconds
+    :type startNs: int
+    :param stepNs: the step length in nanoseconds, used to drop samples repeated across window edges
+    :type stepNs: int
+    '''
+    # first pass counts the rows so the output can be memory mapped at its final size
+    total = 0
+    lastBuckets = {}
+    for path in windowPaths:
+        total += len(thin_table(np.load(path), startNs, stepNs, lastBuckets))
+
+    tempPath = filePath+".part"
+    out = np.lib.format.open_memmap(tempPath, mode="w+", dtype=LOCATION_DTYPE, shape=(total,))
+    idx = 0
+    lastBuckets = {}
+    for path in windowPaths:
+        window = thin_table(np.load(path), startNs, stepNs, lastBuckets)
+        out[idx:idx+len(window)] = window
+        idx += len(window)
+    out.flush()
+    del out
+    os.replace(tempPath, filePath)
+
+def resample_records(records:list, startTime:datetime, stepMs:int, keys:list, policy:str="first", location:bool=False) -> list:
+    '''
+    Resamples OpenF1 dictionaries, eg position data, onto fixed steps
+
+    :param records: the dictionaries
+    :type records: list
+    :param startTime: the time the steps are counted from
+    :type startTime: datetime
+    :param stepMs: the step length in milliseconds
+    :type stepMs: int
+    :param keys: the numeric keys to resample
+    :type keys: list
+    :param policy: one of "first", "last", "mean" or "interp"
+    :type policy: str
+    :param location: if true, (0, 0, 0) x/y/z samples are dropped
+    :type location: bool
+    :return: the resampled dictionaries, with dates as ISO strings
+    :rtype: list
+    '''
+    if len(records) == 0:
+        return []
+
+    times = parse_dates([rec["date"] for rec in records])
+    columns = {}
+    for key in keys:
+        columns[key] = np.array([rec[key] for rec in records])
+    valid = None
+    if location:
+        valid = f1Resample.location_mask([rec["x"] for rec in records], [rec["y"] for rec in records], [rec["z"] for rec in records])
+
+    newTimes, newColumns = f1Resample.resample(times, columns, to_ns(startTime), stepMs*1000000, policy, valid)
+
+    result = []
+    for idx, ns in enumerate(newTimes.tolist()):
+        rec = {"date": from_ns(ns).isoformat()}
+        for key in keys:
+            rec[key] = newColumns[key][idx].item()
+        result.append(rec)
+    return result
@@ -22,6 +22,7 @@ cv.add_sprite(keyCodeText, "text")
 keyCodeText2 = visC.Text("A", 500, 100, 300, color="#FFF")
 cv.add_sprite(keyCodeText2, "text")
 # cv.start_text_input()
+cv.bind_text_input(keyCodeText2) # keyCodeText2 shows what is typed
 ### CODE END
 
 # for sprite in cv.get_sprites_with_tag("dot"):
@@ -29,26 +30,21 @@ cv.add_sprite(keyCodeText2, "text")
 #     sprite.change_pos(200, 100, 30)
 
 
+# called once per frame for each key pressed since the last frame
 def onKeyPress(event):
-    cv.update_keyboard_input(event.keysym)
-    
     ### CODE START - handle key presses
     keyCodeText.change_text('You pressed %s\n' % event.keysym)
-    keyCodeText2.change_text(cv.get_text_input())
     ### CODE END
 
 
 def update():
     ### CODE START - general update stuff
-
+    pass
     ### CODE END
 
-    cv.update()
-
-    # Schedule the next frame
-    canvas.after(int(1000/FPS), update)  # ~30 FPS
-
-root.bind('<KeyPress>', onKeyPress)
+cv.bind_input(root)
+cv.add_input_listener("key", onKeyPress)
 
-update()
+# steps at a fixed FPS, calling update before each step
+cv.run(FPS, update)
 root.mainloop()
\ No newline at end of file
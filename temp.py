@@ -7,6 +7,8 @@ import numpy as np
 import random
 import os
 import time
+import f1Telemetry as f1T
+import f1Fetch
 
 WIDTH = 800
 HEIGHT = 480
@@ -221,41 +223,23 @@ def write_file(filePath, content):
     file.write(content)
     file.close()
 
-def scale_coord(coord, idx):
+def get_map_matrix():
+    '''
+    Builds one affine matrix for the current dot_map_sizing: scale, rotate, then offset
+    '''
     global MAXCOORDS
     global MINCOORDS
 
     global dot_map_sizing
 
-    newVal = (coord-MINCOORDS[idx])/(MAXCOORDS[idx]-MINCOORDS[idx])
-    if idx == 0:
-        aspect_ratio = (MAXCOORDS[0]-MINCOORDS[0])/(MAXCOORDS[1]-MINCOORDS[1]) # w/h
-        newVal *= dot_map_sizing["scale"] * aspect_ratio * -1
-        # newVal += dot_map_sizing["x"]
-    elif idx == 1:
-        newVal *= dot_map_sizing["scale"]
-        # newVal += dot_map_sizing["y"]
+    aspect_ratio = (MAXCOORDS[0]-MINCOORDS[0])/(MAXCOORDS[1]-MINCOORDS[1]) # w/h
+    scale = f1T.scale_matrix(dot_map_sizing["scale"] * aspect_ratio * -1 / (MAXCOORDS[0]-MINCOORDS[0]), dot_map_sizing["scale"] / (MAXCOORDS[1]-MINCOORDS[1]))
+    scale = scale @ f1T.translation_matrix(-MINCOORDS[0], -MINCOORDS[1])
 
-    return newVal
-
-# point needs to be [x, y]
-def rotate_point(point, center=(150, 150)):
-    center = dot_map_sizing["x"]+(dot_map_sizing["scale"]/2)
     center = dot_map_sizing["y"]+(dot_map_sizing["scale"]/2)
-    angle = np.radians(dot_map_sizing["rotation"])
-    rotation_matrix = np.array([
-        [np.cos(angle), -np.sin(angle)],
-        [np.sin(angle),  np.cos(angle)]
-    ])
-    
-    # Step 1: translate so center is origin
-    translated = np.array(point) - np.array(center)
-    
-    # Step 2: rotate
-    rotated = rotation_matrix @ translated
-    
-    # Step 3: translate back
-    return rotated + np.array(center)
+    rotation = f1T.rotation_matrix(dot_map_sizing["rotation"], center, center)
+
+    return f1T.translation_matrix(dot_map_sizing["x"], dot_map_sizing["y"]) @ rotation @ scale
 
 def DEBUG(toPrint, on=True):
     if on:
@@ -269,6 +253,7 @@ def f1_setup_race(session_key=-1):
 
     global f1DriverLocationIdx
     global f1DriverPositionIdx
+    global f1DriverLocationCursor
 
     global f1Sprites
     global f1PositionSprites
@@ -347,17 +332,16 @@ def f1_setup_race(session_key=-1):
         f1DriverData = eval(data)
 
     # --- get the race driver location and position data ---
+    fetcher = f1Fetch.OpenF1Fetcher("saved_sessions/")
     all_locations = []
     for driverInfo in f1DriverData:
         driverNum = driverInfo["driver_number"]
         data = read_file("saved_sessions/"+str(f1Data["session-key"])+"-driver_position-"+str(driverNum)+".txt")
         if data == -1:
             DEBUG("Fetching driver position for "+str(driverNum))
-            response = urlopen("https://api.openf1.org/v1/position?session_key="+str(f1Data["session-key"])+"&driver_number="+str(driverNum))
-            data = json.loads(response.read().decode('utf-8'))
+            data = fetcher.fetch_json("position?session_key="+str(f1Data["session-key"])+"&driver_number="+str(driverNum))
             write_file("saved_sessions/"+str(f1Data["session-key"])+"-driver_position-"+str(driverNum)+".txt", str(data))
             f1DriverPositionData[str(driverNum)] = data
-            time.sleep(30)
         else:
             f1DriverPositionData[str(driverNum)] = eval(data)
 
@@ -365,15 +349,19 @@ def f1_setup_race(session_key=-1):
         data = read_file("saved_sessions/"+str(f1Data["session-key"])+"-driver_location-"+str(driverNum)+".txt")
         if data == -1:
             DEBUG("Fetching driver location for "+str(driverNum))
-            response = urlopen("https://api.openf1.org/v1/location?session_key="+str(f1Data["session-key"])+"&driver_number="+str(driverNum))
-            data = json.loads(response.read().decode('utf-8'))
+            data = fetcher.fetch_json("location?session_key="+str(f1Data["session-key"])+"&driver_number="+str(driverNum))
             write_file("saved_sessions/"+str(f1Data["session-key"])+"-driver_location-"+str(driverNum)+".txt", str(data))
             f1DriverLocationData[str(driverNum)] = data
-            time.sleep(30)
         else:
             f1DriverLocationData[str(driverNum)] = eval(data)
         all_locations += f1DriverLocationData[str(driverNum)]
     
+    # parse every sample time once so the replay can binary search them
+    locationTimes = {}
+    for driverInfo in f1DriverData:
+        locationTimes[str(driverInfo["driver_number"])] = f1T.parse_dates([p["date"] for p in f1DriverLocationData[str(driverInfo["driver_number"])]])
+    f1DriverLocationCursor = f1T.ReplayCursor(locationTimes)
+
     x_vals = [p["x"] for p in all_locations]
     y_vals = [p["y"] for p in all_locations]
     z_vals = [p["z"] for p in all_locations]
@@ -431,9 +419,7 @@ def f1_setup_race(session_key=-1):
         f1Sprites.append(posDot)
         f1Sprites.append(name)
 
-        point = rotate_point([scale_coord(f1DriverLocationData[str(driverNum)][0]["x"], 0), scale_coord(f1DriverLocationData[str(driverNum)][0]["y"], 1)])
-        point[0] += dot_map_sizing["x"]
-        point[1] += dot_map_sizing["y"]
+        point = f1T.apply_transform(get_map_matrix(), [f1DriverLocationData[str(driverNum)][0]["x"]], [f1DriverLocationData[str(driverNum)][0]["y"]])[0]
         locDot = Dot("#"+driverInfo["team_colour"], "#"+driverInfo["team_colour"], DOT_MAP_RADIUS, point[0], point[1])
         f1Sprites.append(locDot)
         f1LocationSprites[str(driverNum)] = locDot
@@ -447,6 +433,7 @@ def f1_update():
 
     global f1DriverLocationIdx
     global f1DriverPositionIdx
+    global f1DriverLocationCursor
 
     global f1Sprites
     global f1PositionSprites
@@ -469,27 +456,26 @@ def f1_update():
     
     for sprite in f1Sprites:
         sprite.update()
+
+    changedLocations = f1DriverLocationCursor.seek(f1T.to_ns(f1Timestamp))
+
+    # transform every moved driver's sample together
+    movedDrivers = [key for key in changedLocations if f1DriverLocationIdx[key] != -1 and not f1DriverLocationCursor.finished[key]]
+    movedSamples = [f1DriverLocationData[key][f1DriverLocationCursor.get_index(key)] for key in movedDrivers]
+    movedPoints = f1T.apply_transform(get_map_matrix(), [p["x"] for p in movedSamples], [p["y"] for p in movedSamples])
+    newLocations = dict(zip(movedDrivers, movedPoints))
         
     for driverInfo in f1DriverData:
         driverNum = driverInfo["driver_number"]
         if f1DriverLocationIdx[str(driverNum)] != -1:
-            currentLocationData = f1DriverLocationData[str(driverNum)][f1DriverLocationIdx[str(driverNum)]]
             # --- check location change ---
-            changed = False
-            while datetime.fromisoformat(currentLocationData["date"]) < f1Timestamp:
-                f1DriverLocationIdx[str(driverNum)] += 1
-                try:
-                    currentLocationData = f1DriverLocationData[str(driverNum)][f1DriverLocationIdx[str(driverNum)]]
-                    changed = True
-                except IndexError:
-                    DEBUG("Out of range for driver "+str(driverNum)+": "+str(f1DriverLocationData[str(driverNum)][-1]))
-                    f1DriverLocationIdx[str(driverNum)] = -1
-                    f1LocationSprites[str(driverNum)].change_pos(0, HEIGHT, 10)
-                    break
-            if changed:
-                point = rotate_point([scale_coord(currentLocationData["x"], 0), scale_coord(currentLocationData["y"], 1)])
-                point[0] += dot_map_sizing["x"]
-                point[1] += dot_map_sizing["y"]
+            if f1DriverLocationCursor.finished[str(driverNum)]:
+                DEBUG("Out of range for driver "+str(driverNum)+": "+str(f1DriverLocationData[str(driverNum)][-1]))
+                f1DriverLocationIdx[str(driverNum)] = -1
+                f1LocationSprites[str(driverNum)].change_pos(0, HEIGHT, 10)
+            elif str(driverNum) in newLocations:
+                f1DriverLocationIdx[str(driverNum)] = f1DriverLocationCursor.get_index(str(driverNum))
+                point = newLocations[str(driverNum)]
                 f1LocationSprites[str(driverNum)].change_pos(point[0], point[1])
         if f1DriverPositionIdx[str(driverNum)] != -1:
             # --- check position change ---
@@ -7,8 +7,14 @@ Sprites keep track of individual values, such as positon and movement changes
 
 import tkinter as tk
 import tkinter.font as tkFont
+import time
+import json
+import math
+import heapq
+from collections import OrderedDict, deque
 from datetime import datetime, timezone, timedelta
 from PIL import Image, ImageTk
+import numpy as np
 
 CHARS = {
     "grave":"`",
@@ -46,13 +52,772 @@ CHARS = {
     "space":" "
 }
 
-IGNORE_CHARS = [
+IGNORE_CHARS = {
     "tab", "caps_lock", "return", "shift_l", "shift_r", "super_l", "super_r",
     "control_l", "control_r", "alt_l", "alt_r", "meta_l", "meta_r", "left",
-    "right", "up", "down"
-]
+    "right", "up", "down", "home", "end"
+}
+
+# only the latest of these is kept when several arrive in a row
+COALESCED_EVENTS = {"motion", "drag"}
+
+class FontMetrics():
+    '''
+    Caches per-character widths for each (font, size) so text can be measured without asking tkinter every time
+    '''
+    def __init__(self, maxFonts:int=16, maxFits:int=1024, fontFactory=None):
+        '''
+        Sets up empty caches
+        
+        :param self: n/a
+        :param fontFactory: a function taking a font name and size and returning an object with a measure(text) method, tkinter fonts are used if not given
+        :param maxFonts: the number of (font, size) pairs kept before the least recently used is dropped
+        :type maxFonts: int
+        :param maxFits: the number of fitted font sizes kept before the least recently used is dropped
+        :type maxFits: int
+        '''
+        self.maxFonts = maxFonts
+        self.maxFits = maxFits
+        self.fontFactory = fontFactory
+        self.fonts = OrderedDict()
+        self.fits = OrderedDict()
+
+    def get_font(self, family:str, size:int) -> list:
+        '''
+        Gets the cache entry for a font, creating it if needed
+        
+        :param self: n/a
+        :param family: the name of the font
+        :type family: str
+        :param size: the font size
+        :type size: int
+        :return: [font, dictionary of character widths]
+        :rtype: list
+        '''
+        key = (family, size)
+        if key in self.fonts:
+            self.fonts.move_to_end(key)
+            return self.fonts[key]
+
+        if self.fontFactory is None:
+            font = tkFont.Font(family=family, size=size)
+        else:
+            font = self.fontFactory(family, size)
+        entry = [font, {}]
+        self.fonts[key] = entry
+        if len(self.fonts) > self.maxFonts:
+            self.fonts.popitem(last=False)
+        return entry
+
+    def measure(self, text:str, family:str, size:int) -> int:
+        '''
+        Gets the width of a string by adding up cached character widths
+        
+        :param self: n/a
+        :param text: the text to measure
+        :type text: str
+        :param family: the name of the font
+        :type family: str
+        :param size: the font size
+        :type size: int
+        :return: the width in pixels
+        :rtype: int
+        '''
+        font, widths = self.get_font(family, size)
+        total = 0
+        for char in text:
+            if char not in widths:
+                widths[char] = font.measure(char)
+            total += widths[char]
+        return total
+
+    def fit_size(self, text:str, width:int, family:str, size:int, maxSize:int) -> int:
+        '''
+        Gets the font size that makes the text fill the width, remembering the answer
+        
+        :param self: n/a
+        :param text: the text to fit
+        :type text: str
+        :param width: the width to fill
+        :type width: int
+        :param family: the name of the font
+        :type family: str
+        :param size: the font size the text is measured at
+        :type size: int
+        :param maxSize: the largest allowed font size
+        :type maxSize: int
+        :return: the fitted font size
+        :rtype: int
+        '''
+        key = (text, width, family, size, maxSize)
+        if key in self.fits:
+            self.fits.move_to_end(key)
+            return self.fits[key]
+
+        textWidth = self.measure(text, family, size)
+        if textWidth == 0:
+            return size
+        newFontSize = min(int(size * width/textWidth), maxSize)
+
+        self.fits[key] = newFontSize
+        if len(self.fits) > self.maxFits:
+            self.fits.popitem(last=False)
+        return newFontSize
+
+FONT_METRICS = FontMetrics()
+
+class EngineField():
+    '''
+    A sprite attribute that lives in the sprite's own dictionary until the sprite is attached to a SpriteEngine, after which it reads and writes the engine's arrays
+    '''
+    def __init__(self, wakes:bool=False):
+        '''
+        Sets up the attribute
+        
+        :param self: n/a
+        :param wakes: whether setting the attribute to something nonzero starts the sprite animating, eg velocities and delays
+        :type wakes: bool
+        '''
+        self.wakes = wakes
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, sprite, owner=None):
+        if sprite is None:
+            return self
+        engine = sprite.__dict__.get("engine")
+        if engine is not None:
+            return float(engine.arrays[self.name][sprite.engineIdx])
+        try:
+            return sprite.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(self.name)
+
+    def __set__(self, sprite, value):
+        engine = sprite.__dict__.get("engine")
+        if engine is not None:
+            engine.arrays[self.name][sprite.engineIdx] = value
+        else:
+            sprite.__dict__[self.name] = value
+            if self.wakes and value != 0:
+                # scripts that set eg vX directly still get the sprite moving
+                visCanvas = sprite.__dict__.get("visCanvas")
+                if visCanvas is not None:
+                    visCanvas.wake(sprite)
+
+class WakeField():
+    '''
+    A sprite attribute that SpriteEngine doesn't store, kept in the sprite's own dictionary. Setting it to something nonzero starts the sprite animating, like an EngineField made with wakes
+    '''
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, sprite, owner=None):
+        if sprite is None:
+            return self
+        try:
+            return sprite.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(self.name)
+
+    def __set__(self, sprite, value):
+        sprite.__dict__[self.name] = value
+        if value != 0:
+            visCanvas = sprite.__dict__.get("visCanvas")
+            if visCanvas is not None:
+                visCanvas.wake(sprite)
+
+class SpriteEngine():
+    '''
+    Structure-of-arrays storage for Dot and Rect sprites so a whole frame of movement can be stepped in one pass
+    '''
+    FIELDS = ("x", "y", "vX", "vY", "dX", "dY", "r", "dR", "targetR", "w", "h", "wait", "endChange", "gravityScale", "onGround")
+
+    def __init__(self, capacity:int=256):
+        '''
+        Sets up empty arrays for the engine
+        
+        :param self: n/a
+        :param capacity: the starting number of sprite slots, which doubles whenever it runs out
+        :type capacity: int
+        '''
+        self.capacity = capacity
+        self.count = 0
+        self.arrays = {}
+        for field in self.FIELDS:
+            self.arrays[field] = np.zeros(capacity, dtype=np.float64)
+        self.isDot = np.zeros(capacity, dtype=bool)
+
+        self.sprites = []
+        self.itemIds = []
+        self.rects = {}
+
+    def grow(self):
+        '''
+        Doubles the capacity of every array
+        
+        :param self: n/a
+        '''
+        self.capacity *= 2
+        for field in self.FIELDS:
+            newArr = np.zeros(self.capacity, dtype=np.float64)
+            newArr[:self.count] = self.arrays[field][:self.count]
+            self.arrays[field] = newArr
+        newIsDot = np.zeros(self.capacity, dtype=bool)
+        newIsDot[:self.count] = self.isDot[:self.count]
+        self.isDot = newIsDot
+
+    def add(self, sprite):
+        '''
+        Moves a sprite's state into the engine, turning the sprite into a view onto the arrays
+        
+        :param self: n/a
+        :param sprite: an initialized Dot or Rect
+        '''
+        if self.count >= self.capacity:
+            self.grow()
+
+        idx = self.count
+        for field in self.FIELDS:
+            self.arrays[field][idx] = sprite.__dict__.pop(field, 0)
+        self.isDot[idx] = isinstance(sprite, Dot)
+
+        sprite.engine = self
+        sprite.engineIdx = idx
+
+        self.sprites.append(sprite)
+        if isinstance(sprite, Dot):
+            self.itemIds.append(sprite.dot)
+        else:
+            self.itemIds.append(sprite.rect)
+            self.rects[sprite] = None
+        self.count += 1
+
+    def remove(self, sprite) -> tuple:
+        '''
+        Moves a sprite's state back onto the sprite and fills its slot with the last sprite, so removal doesn't shift the arrays
+        
+        :param self: n/a
+        :param sprite: a sprite in the engine
+        :return: the removed index and the index of the sprite that was moved into it
+        :rtype: tuple
+        '''
+        idx = sprite.engineIdx
+        last = self.count-1
+        for field in self.FIELDS:
+            sprite.__dict__[field] = float(self.arrays[field][idx])
+        sprite.__dict__["onGround"] = bool(self.arrays["onGround"][idx])
+        sprite.engine = None
+        del sprite.engineIdx
+
+        if idx != last:
+            for field in self.FIELDS:
+                self.arrays[field][idx] = self.arrays[field][last]
+            self.isDot[idx] = self.isDot[last]
+            movedSprite = self.sprites[last]
+            movedSprite.engineIdx = idx
+            self.sprites[idx] = movedSprite
+            self.itemIds[idx] = self.itemIds[last]
+        for field in self.FIELDS:
+            self.arrays[field][last] = 0
+        self.sprites.pop()
+        self.itemIds.pop()
+        self.rects.pop(sprite, None)
+        self.count -= 1
+        return idx, last
+
+    def step(self, framesPassed:int) -> np.ndarray:
+        '''
+        Applies waits, velocities, position tweens, gravity and dot radius tweens to every sprite at once
+        
+        :param self: n/a
+        :param framesPassed: the overall frame count
+        :return: the indices of the sprites whose geometry changed
+        :rtype: np.ndarray
+        '''
+        n = self.count
+        a = {field: arr[:n] for field, arr in self.arrays.items()}
+        isDot = self.isDot[:n]
+
+        # waiting sprites only count down
+        waiting = a["wait"] > 0
+        a["wait"][waiting] -= 1
+        a["endChange"][waiting] += 1
+        active = ~waiting
+
+        # velocity
+        moving = active & ((a["vX"] != 0) | (a["vY"] != 0))
+        a["x"][moving] += a["vX"][moving]
+        a["y"][moving] += a["vY"][moving]
+
+        # position tweens
+        tweening = active & ((a["dX"] != 0) | (a["dY"] != 0))
+        a["x"][tweening] += a["dX"][tweening]
+        a["y"][tweening] += a["dY"][tweening]
+        finished = tweening & (framesPassed >= a["endChange"])
+        a["dX"][finished] = 0
+        a["dY"][finished] = 0
+
+        # gravity, unless resting on a wall
+        jumping = active & (a["onGround"] != 0) & (a["vY"] < 0)
+        a["onGround"][jumping] = 0
+        falling = active & (a["onGround"] == 0)
+        a["vY"][falling] += a["gravityScale"][falling]
+
+        # dot radius tweens
+        resizing = isDot & (a["wait"] <= 0) & (a["dR"] != 0)
+        snapping = resizing & (np.abs(a["targetR"]-a["r"]) <= np.abs(a["dR"]*2))
+        a["r"][snapping] = a["targetR"][snapping]
+        a["dR"][snapping] = 0
+        growing = resizing & ~snapping
+        a["r"][growing] += a["dR"][growing]
+
+        return np.flatnonzero(moving | tweening | resizing)
+
+    def get_coords(self, indices:np.ndarray) -> list:
+        '''
+        Gets the tkinter coords for the given sprites, computed for all of them at once
+        
+        :param self: n/a
+        :param indices: the sprite indices
+        :type indices: np.ndarray
+        :return: an [x0, y0, x1, y1] list for each index
+        :rtype: list
+        '''
+        x = self.arrays["x"][indices]
+        y = self.arrays["y"][indices]
+        r = self.arrays["r"][indices]
+        isDot = self.isDot[indices]
+        x0 = np.where(isDot, x-r, x)
+        y0 = np.where(isDot, y-r, y)
+        x1 = np.where(isDot, x+r, x+self.arrays["w"][indices])
+        y1 = np.where(isDot, y+r, y+self.arrays["h"][indices])
+        return np.stack((x0, y0, x1, y1), axis=1).tolist()
+
+    def get_physics_sprites(self) -> list:
+        '''
+        Gets the sprites that could be touching a wall this frame
+        
+        :param self: n/a
+        :return: sprites that are moving, have gravity or are on the ground
+        :rtype: list
+        '''
+        n = self.count
+        a = self.arrays
+        mask = (a["gravityScale"][:n] != 0) | (a["vX"][:n] != 0) | (a["vY"][:n] != 0) | (a["onGround"][:n] != 0)
+        return [self.sprites[idx] for idx in np.flatnonzero(mask).tolist()]
+
+class Renderer():
+    '''
+    Retained-mode render layer. Sprites mark themselves dirty when they change and the final geometry and config of each dirty item is sent to tkinter once per frame
+    '''
+    def __init__(self, canvas):
+        '''
+        Sets up the renderer
+        
+        :param self: n/a
+        :param canvas: the tkinter canvas
+        '''
+        self.canvas = canvas
+
+        self.dirty = {}
+        self.sentCoords = {}
+        self.sentConfig = {}
+
+        self.tkCalls = 0
+
+    def track(self, sprite):
+        '''
+        Starts tracking a sprite whose item was just created, recording the state tkinter already has
+        
+        :param self: n/a
+        :param sprite: the initialized sprite
+        '''
+        sprite.renderer = self
+        item, coords, config = sprite.render_state()
+        self.sentCoords[item] = tuple(coords)
+        self.sentConfig[item] = dict(config)
+
+    def untrack(self, sprite):
+        '''
+        Stops tracking a sprite that is being removed
+        
+        :param self: n/a
+        :param sprite: the sprite
+        '''
+        self.dirty.pop(sprite, None)
+        item = sprite.render_state()[0]
+        self.sentCoords.pop(item, None)
+        self.sentConfig.pop(item, None)
+        if sprite.renderer is self:
+            sprite.renderer = None
+
+    def mark_dirty(self, sprite):
+        '''
+        Queues a sprite to be sent to tkinter on the next flush
+        
+        :param self: n/a
+        :param sprite: the changed sprite
+        '''
+        self.dirty[sprite] = None
+
+    def set_coords(self, item, coords):
+        '''
+        Sends coords for an item if they differ from what tkinter already has
+        
+        :param self: n/a
+        :param item: the tkinter item id
+        :param coords: the new coords
+        :return: true if the coords were sent
+        :rtype: bool
+        '''
+        coords = tuple(coords)
+        if self.sentCoords.get(item) != coords:
+            self.canvas.coords(item, *coords)
+            self.sentCoords[item] = coords
+            self.tkCalls += 1
+            return True
+        return False
+
+    def set_config(self, item, config:dict):
+        '''
+        Sends only the options of an item that differ from what tkinter already has
+        
+        :param self: n/a
+        :param item: the tkinter item id
+        :param config: the full option values for the item
+        :type config: dict
+        '''
+        sent = self.sentConfig.setdefault(item, {})
+        changed = {}
+        for key, val in config.items():
+            if sent.get(key) != val:
+                changed[key] = val
+        if len(changed) > 0:
+            self.canvas.itemconfig(item, **changed)
+            sent.update(changed)
+            self.tkCalls += 1
+
+    def edit_text(self, sprite, item, oldText:str, start:int, deleteCount:int, insertText:str) -> bool:
+        '''
+        Replaces a span of a text item's characters without sending the whole string. Only works if tkinter already has oldText and nothing else is waiting to be sent for the sprite
+        
+        :param self: n/a
+        :param sprite: the text sprite
+        :param item: the tkinter item id
+        :param oldText: the text tkinter should have
+        :type oldText: str
+        :param start: the index of the first changed character
+        :type start: int
+        :param deleteCount: the number of characters deleted from start
+        :type deleteCount: int
+        :param insertText: the characters inserted at start
+        :type insertText: str
+        :return: true if the edit was sent
+        :rtype: bool
+        '''
+        sent = self.sentConfig.get(item, {})
+        if sprite in self.dirty or sent.get("text") != oldText:
+            return False
+        if deleteCount > 0:
+            self.canvas.dchars(item, start, start+deleteCount-1)
+            self.tkCalls += 1
+        if len(insertText) > 0:
+            self.canvas.insert(item, start, insertText)
+            self.tkCalls += 1
+        sent["text"] = oldText[:start] + insertText + oldText[start+deleteCount:]
+        return True
+
+    def flush(self) -> list:
+        '''
+        Sends the final state of every dirty sprite to tkinter
+        
+        :param self: n/a
+        :return: the sprites whose coords changed
+        :rtype: list
+        '''
+        moved = []
+        for sprite in self.dirty:
+            item, coords, config = sprite.render_state()
+            if self.set_coords(item, coords):
+                moved.append(sprite)
+            self.set_config(item, config)
+        self.dirty.clear()
+        return moved
+
+class SpatialGrid():
+    '''
+    Uniform grid of bounding boxes so point and box queries only look at nearby objects
+    '''
+    def __init__(self, cellSize:int=64):
+        '''
+        Sets up an empty grid
+        
+        :param self: n/a
+        :param cellSize: the width and height of each grid cell in pixels
+        :type cellSize: int
+        '''
+        self.cellSize = cellSize
+        self.cells = {}
+        self.bounds = {}
+        self.cellsOf = {}
+
+    def get_cells(self, bounds:tuple) -> list:
+        '''
+        Gets the keys of every cell a bounding box touches
+        
+        :param self: n/a
+        :param bounds: (x0, y0, x1, y1)
+        :type bounds: tuple
+        :return: the cell keys
+        :rtype: list
+        '''
+        cx0 = int(bounds[0]//self.cellSize)
+        cy0 = int(bounds[1]//self.cellSize)
+        cx1 = int(bounds[2]//self.cellSize)
+        cy1 = int(bounds[3]//self.cellSize)
+        return [(cx, cy) for cx in range(cx0, cx1+1) for cy in range(cy0, cy1+1)]
+
+    def insert(self, obj, bounds:tuple):
+        '''
+        Adds an object, or moves it if it is already in the grid
+        
+        :param self: n/a
+        :param obj: the object to store
+        :param bounds: (x0, y0, x1, y1)
+        :type bounds: tuple
+        '''
+        if obj in self.bounds:
+            if self.bounds[obj] == bounds:
+                return
+            newCells = self.get_cells(bounds)
+            if newCells == self.cellsOf[obj]:
+                self.bounds[obj] = bounds
+                return
+            self.remove(obj)
+        else:
+            newCells = self.get_cells(bounds)
+
+        self.bounds[obj] = bounds
+        self.cellsOf[obj] = newCells
+        for key in newCells:
+            if key in self.cells:
+                self.cells[key].add(obj)
+            else:
+                self.cells[key] = {obj}
+
+    def remove(self, obj):
+        '''
+        Removes an object from the grid
+        
+        :param self: n/a
+        :param obj: the stored object
+        '''
+        if obj not in self.bounds:
+            return
+        for key in self.cellsOf[obj]:
+            cell = self.cells[key]
+            cell.discard(obj)
+            if len(cell) == 0:
+                del self.cells[key]
+        del self.bounds[obj]
+        del self.cellsOf[obj]
+
+    def query_point(self, x:float, y:float) -> set:
+        '''
+        Gets every object stored in the cell under a point
+        
+        :param self: n/a
+        :param x: the x coordinate
+        :type x: float
+        :param y: the y coordinate
+        :type y: float
+        :return: the candidate objects
+        :rtype: set
+        '''
+        return self.cells.get((int(x//self.cellSize), int(y//self.cellSize)), set())
+
+    def query_box(self, bounds:tuple) -> set:
+        '''
+        Gets every object in the cells a bounding box touches
+        
+        :param self: n/a
+        :param bounds: (x0, y0, x1, y1)
+        :type bounds: tuple
+        :return: the candidate objects
+        :rtype: set
+        '''
+        found = set()
+        for key in self.get_cells(bounds):
+            if key in self.cells:
+                found |= self.cells[key]
+        return found
+
+def boxes_overlap(box1:tuple, box2:tuple) -> bool:
+    '''
+    Checks if two bounding boxes overlap
+    
+    :param box1: (x0, y0, x1, y1)
+    :type box1: tuple
+    :param box2: (x0, y0, x1, y1)
+    :type box2: tuple
+    :return: true if the boxes overlap by more than an edge
+    :rtype: bool
+    '''
+    return box1[0] < box2[2] and box2[0] < box1[2] and box1[1] < box2[3] and box2[1] < box1[3]
+
+class TagIndex():
+    '''
+    Two-way index between tags and sprites. Each tag keeps its sprites in an insertion ordered set, so adding, removing and checking a sprite don't depend on how many sprites share the tag
+    '''
+    def __init__(self):
+        '''
+        Sets up an empty index
+        
+        :param self: n/a
+        '''
+        self.spritesOf = {}
+        self.tagsOf = {}
+        self.order = {}
+        self.orderCount = 0
+
+    def add(self, sprite, tags:list|str):
+        '''
+        Gives a sprite one or more tags
+        
+        :param self: n/a
+        :param sprite: the sprite
+        :param tags: a tag or a list of tags
+        :type tags: list|str
+        '''
+        if type(tags) == str:
+            tags = [tags]
+        if sprite not in self.order:
+            # a running count, so ranks stay unique after sprites are removed
+            self.orderCount += 1
+            self.order[sprite] = self.orderCount
+        spriteTags = self.tagsOf.setdefault(sprite, set())
+        for tag in tags:
+            # dictionary keys are used as an ordered set
+            self.spritesOf.setdefault(tag, {})[sprite] = None
+            spriteTags.add(tag)
+
+    def untag(self, sprite, tag:str):
+        '''
+        Takes one tag off a sprite
+        
+        :param self: n/a
+        :param sprite: the sprite
+        :param tag: the tag
+        :type tag: str
+        '''
+        sprites = self.spritesOf.get(tag)
+        if sprites is None or sprite not in sprites:
+            return
+        del sprites[sprite]
+        if len(sprites) == 0:
+            del self.spritesOf[tag]
+        self.tagsOf[sprite].discard(tag)
+
+    def remove_sprite(self, sprite):
+        '''
+        Takes every tag off a sprite
+        
+        :param self: n/a
+        :param sprite: the sprite
+        '''
+        for tag in list(self.tagsOf.get(sprite, [])):
+            self.untag(sprite, tag)
+        self.tagsOf.pop(sprite, None)
+        self.order.pop(sprite, None)
+
+    def remove_tag(self, tag:str):
+        '''
+        Takes a tag off every sprite that has it
+        
+        :param self: n/a
+        :param tag: the tag
+        :type tag: str
+        '''
+        for sprite in self.spritesOf.pop(tag, {}):
+            self.tagsOf[sprite].discard(tag)
+
+    def get(self, tag:str) -> list:
+        '''
+        Gets the sprites with a tag, in the order they were tagged
+        
+        :param self: n/a
+        :param tag: the tag
+        :type tag: str
+        :return: the sprites
+        :rtype: list
+        '''
+        return list(self.spritesOf.get(tag, {}))
+
+    def get_tags(self, sprite) -> set:
+        '''
+        Gets the tags of a sprite
+        
+        :param self: n/a
+        :param sprite: the sprite
+        :return: the tags
+        :rtype: set
+        '''
+        return set(self.tagsOf.get(sprite, set()))
+
+    def has_tag(self, sprite, tag:str) -> bool:
+        return sprite in self.spritesOf.get(tag, {})
+
+    def query(self, allTags:list=[], anyTags:list=[], notTags:list=[]) -> list:
+        '''
+        Gets the sprites that have every tag in allTags, at least one tag in anyTags and no tag in notTags. Empty lists are ignored, and with no allTags or anyTags every tagged sprite is a candidate
+        
+        :param self: n/a
+        :param allTags: tags a sprite must all have (AND)
+        :type allTags: list
+        :param anyTags: tags a sprite must have one of (OR)
+        :type anyTags: list
+        :param notTags: tags a sprite must not have (NOT)
+        :type notTags: list
+        :return: the matching sprites, in the order they were first tagged
+        :rtype: list
+        '''
+        if len(allTags) > 0:
+            # start from the smallest tag so the fewest sprites are checked
+            smallest = min(allTags, key=lambda tag: len(self.spritesOf.get(tag, {})))
+            candidates = self.spritesOf.get(smallest, {}).keys()
+        elif len(anyTags) > 0:
+            candidates = set()
+            for tag in anyTags:
+                candidates |= self.spritesOf.get(tag, {}).keys()
+        else:
+            candidates = self.tagsOf.keys()
+
+        matches = []
+        for sprite in candidates:
+            spriteTags = self.tagsOf[sprite]
+            if not all(tag in spriteTags for tag in allTags):
+                continue
+            if len(anyTags) > 0 and not any(tag in spriteTags for tag in anyTags):
+                continue
+            if any(tag in spriteTags for tag in notTags):
+                continue
+            matches.append(sprite)
+        return sorted(matches, key=self.order.__getitem__)
 
 class Sprite():
+    x = EngineField()
+    y = EngineField()
+    vX = EngineField(wakes=True)
+    vY = EngineField(wakes=True)
+    dX = EngineField(wakes=True)
+    dY = EngineField(wakes=True)
+    wait = EngineField(wakes=True)
+    endChange = EngineField()
+    gravityScale = EngineField(wakes=True)
+    onGround = EngineField()
+
     def __init__(self, x:int=0, y:int=0, gravityScale:float=0):
         '''
         Sets up a base sprite
@@ -75,10 +840,15 @@ class Sprite():
         self.vX = 0
         self.vY = 0
         self.gravityScale = gravityScale
+        self.onGround = False
 
         self.wait = 0
 
         self.initialized = False
+        self.engine = None
+        self.renderer = None
+        self.visCanvas = None
+        self.sleepTimer = None
     
     def delay(self, delayAmount:int):
         '''
@@ -91,6 +861,39 @@ class Sprite():
         if not self.initialized:
             return
         self.wait = delayAmount
+        if self.visCanvas is not None:
+            self.visCanvas.sleep_sprite(self, delayAmount)
+
+    def get_frame(self) -> int:
+        '''
+        Gets the frame count of the canvas this sprite is on, or 0 if it isn't on one
+        
+        :param self: n/a
+        :return: the frame count
+        :rtype: int
+        '''
+        if self.visCanvas is None:
+            return 0
+        return self.visCanvas.framesPassed
+
+    def wake(self):
+        '''
+        Tells the canvas this sprite has something to animate, so it gets updated every frame until it comes to rest
+        
+        :param self: n/a
+        '''
+        if self.visCanvas is not None:
+            self.visCanvas.wake(self)
+
+    def is_resting(self) -> bool:
+        '''
+        Checks if updating this sprite would do nothing
+        
+        :param self: n/a
+        :return: true if the sprite has no delay, movement or falling left
+        :rtype: bool
+        '''
+        return self.wait <= 0 and self.vX == 0 and self.vY == 0 and self.dX == 0 and self.dY == 0 and (self.gravityScale == 0 or self.onGround)
     
     def change_pos(self, newX:int, newY:int, duration:int=0):
         '''
@@ -111,22 +914,38 @@ class Sprite():
         if duration == 0:
             self.x = newX
             self.y = newY
-            try:
-                self.CANVAS.coords(self.dot, self.x-self.r, self.y-self.r, self.x+self.r, self.y+self.r)
-            except AttributeError:
-                self.CANVAS.coords(self.rect, self.x-self.r, self.y-self.r, self.x+self.r, self.y+self.r)
+            self.redraw()
         else:
-            self.endChange = duration
+            self.endChange = self.get_frame() + duration
             self.dX = (newX-self.x)/duration
             self.dY = (newY-self.y)/duration
+            self.wake()
     
+    def redraw(self):
+        '''
+        Marks the sprite as changed, or sends it to tkinter right away if it has no renderer
+        
+        :param self: n/a
+        '''
+        if not self.initialized:
+            return
+
+        if self.renderer is not None:
+            self.renderer.mark_dirty(self)
+        else:
+            item, coords, config = self.render_state()
+            self.CANVAS.coords(item, *coords)
+            self.CANVAS.itemconfig(item, **config)
+
     def add_velocity(self, vX=0, vY=0):
         self.vX += vX
         self.vY += vY
+        self.wake()
 
     def set_velocity(self, vX=0, vY=0):
         self.vX = vX
         self.vY = vY
+        self.wake()
     
     def base_update(self, framesPassed):
         '''
@@ -153,11 +972,18 @@ class Sprite():
                     self.dX = 0
                     self.dY = 0
             
-            # TODO: check if on ground
-            self.vY += self.gravityScale
+            if self.onGround and self.vY < 0:
+                # jumped off the ground
+                self.onGround = False
+            if not self.onGround:
+                self.vY += self.gravityScale
 
 
 class Dot(Sprite):
+    r = EngineField()
+    dR = EngineField(wakes=True)
+    targetR = EngineField()
+
     def __init__(self, color:str="white", outline:str="white", r:int=5, x:int=0, y:int=0, gravityScale:float=0):
         '''
         Sets up a dot sprite
@@ -215,10 +1041,11 @@ class Dot(Sprite):
         
         if duration == 0:
             self.r = newR
-            self.CANVAS.coords(self.dot, self.x-self.r, self.y-self.r, self.x+self.r, self.y+self.r)
+            self.redraw()
         else:
             self.targetR = newR
             self.dR = (self.targetR-self.r)/duration
+            self.wake()
     
     def change_color(self, newColor:str):
         '''
@@ -232,7 +1059,7 @@ class Dot(Sprite):
             return
         
         self.color = newColor
-        self.CANVAS.itemconfig(self.dot, fill=newColor)
+        self.redraw()
 
     def change_outline_color(self, newColor:str):
         '''
@@ -246,7 +1073,37 @@ class Dot(Sprite):
             return
         
         self.outline = newColor
-        self.CANVAS.itemconfig(self.dot, outline=newColor)
+        self.redraw()
+
+    def is_resting(self) -> bool:
+        '''
+        Checks if updating this dot would do nothing
+        
+        :param self: n/a
+        :return: true if the dot has no delay, movement, falling or resizing left
+        :rtype: bool
+        '''
+        return super().is_resting() and self.dR == 0
+
+    def render_state(self) -> tuple:
+        '''
+        Gets what tkinter should be showing for this dot
+        
+        :param self: n/a
+        :return: the item id, the coords and the item options
+        :rtype: tuple
+        '''
+        return self.dot, (self.x-self.r, self.y-self.r, self.x+self.r, self.y+self.r), {"fill":self.color, "outline":self.outline}
+
+    def get_bounds(self) -> tuple:
+        '''
+        Gets the dot's bounding box
+        
+        :param self: n/a
+        :return: (x0, y0, x1, y1)
+        :rtype: tuple
+        '''
+        return (self.x-self.r, self.y-self.r, self.x+self.r, self.y+self.r)
     
     def update(self, framesPassed):
         '''
@@ -269,6 +1126,11 @@ class Dot(Sprite):
                     self.change_size(self.r+self.dR)
 
 class Rect(Sprite):
+    w = EngineField()
+    h = EngineField()
+    dW = WakeField()
+    dH = WakeField()
+
     def __init__(self, color:str="white", outline:str="white", w:int=5, h:int=5, x:int=0, y:int=0, gravityScale:float=0):
         '''
         Sets up a rectangle sprite
@@ -332,13 +1194,14 @@ class Rect(Sprite):
         if duration == 0:
             self.w = newW
             self.h = newH
-            self.CANVAS.coords(self.x, self.y, self.x+self.w, self.y+self.h, fill=self.color, outline=self.outline)
+            self.redraw()
         else:
             self.targetW = newW
             self.dW = (self.targetW-self.w)/duration
 
             self.targetH = newH
             self.dH = (self.targetH-self.h)/duration
+            self.wake()
     
     def change_color(self, newColor:str):
         '''
@@ -352,7 +1215,37 @@ class Rect(Sprite):
             return
         
         self.color = newColor
-        self.CANVAS.itemconfig(self.rect, fill=newColor)
+        self.redraw()
+
+    def is_resting(self) -> bool:
+        '''
+        Checks if updating this rect would do nothing
+        
+        :param self: n/a
+        :return: true if the rect has no delay, movement, falling or resizing left
+        :rtype: bool
+        '''
+        return super().is_resting() and self.dW == 0 and self.dH == 0
+
+    def render_state(self) -> tuple:
+        '''
+        Gets what tkinter should be showing for this rect
+        
+        :param self: n/a
+        :return: the item id, the coords and the item options
+        :rtype: tuple
+        '''
+        return self.rect, (self.x, self.y, self.x+self.w, self.y+self.h), {"fill":self.color, "outline":self.outline}
+
+    def get_bounds(self) -> tuple:
+        '''
+        Gets the rect's bounding box
+        
+        :param self: n/a
+        :return: (x0, y0, x1, y1)
+        :rtype: tuple
+        '''
+        return (self.x, self.y, self.x+self.w, self.y+self.h)
     
     def update(self, framesPassed):
         '''
@@ -366,23 +1259,62 @@ class Rect(Sprite):
         if not self.initialized:
             return
         
+        self.update_size()
+
+    def update_size(self):
+        '''
+        Steps any size change that is in progress
+        
+        :param self: n/a
+        '''
         if self.wait <= 0:
             if self.dW != 0:
                 if abs(self.targetW-self.w) <= abs(self.dW*2):
                     self.dW = 0
-                    self.change_size(self.targetW)
+                    self.change_size(self.targetW, self.h)
                 else:
-                    self.change_size(self.w+self.dW)
+                    self.change_size(self.w+self.dW, self.h)
             if self.dH != 0:
-                if abs(self.targetH-self.h) <= abs(self.dh*2):
-                    self.dh = 0
-                    self.change_size(self.targetH)
+                if abs(self.targetH-self.h) <= abs(self.dH*2):
+                    self.dH = 0
+                    self.change_size(self.w, self.targetH)
                 else:
-                    self.change_size(self.h+self.dh)
+                    self.change_size(self.w, self.h+self.dH)
 
 class HorizontalSlider(Sprite):
-    def __init__(self, bgColor:str="black", bgOutline:str="white", buttonColor:str="white", buttonOutline:str="white", w:int=5, h:int=5, x:int=0, y:int=0, gravityScale:float=0):
-        super().__init__(x, y, gravityScale)
+    def __init__(self, bgColor:str="black", bgOutline:str="white", buttonColor:str="white", buttonOutline:str="white", w:int=5, h:int=5, x:int=0, y:int=0, gravityScale:float=0, minVal:float=0, maxVal:float=1, onChange=None, changeDelay:float=0, debounce:bool=False, clock=time.perf_counter):
+        '''
+        Sets up a slider, a square button that is dragged along a bar to pick a value
+        
+        :param self: n/a
+        :param bgColor: a hex code for the color of the bar
+        :type bgColor: str
+        :param bgOutline: a hex code for the color of the bar's outline
+        :type bgOutline: str
+        :param buttonColor: a hex code for the color of the button
+        :type buttonColor: str
+        :param buttonOutline: a hex code for the color of the button's outline
+        :type buttonOutline: str
+        :param w: the width of the bar
+        :type w: int
+        :param h: the height of the bar and the size of the button
+        :type h: int
+        :param x: the x coordinate of the slider
+        :type x: int
+        :param y: the y coordinate of the slider
+        :type y: int
+        :param minVal: the value with the button at the left end
+        :type minVal: float
+        :param maxVal: the value with the button at the right end
+        :type maxVal: float
+        :param onChange: a function taking the new value, called when the value changes
+        :param changeDelay: the fewest seconds between onChange calls while dragging, or with debounce, how long the value has to stay still before onChange is called
+        :type changeDelay: float
+        :param debounce: only call onChange once the value stops changing instead of at most once every changeDelay
+        :type debounce: bool
+        :param clock: a function returning the time in seconds
+        '''
+        super().__init__(x, y, gravityScale)
 
         self.x = x
         self.y = y
@@ -400,7 +1332,19 @@ class HorizontalSlider(Sprite):
         self.buttonColor = buttonColor
         self.buttonOutline = buttonOutline
 
-        self.sliderVal = 0
+        self.minVal = minVal
+        self.maxVal = maxVal
+        self.sliderVal = minVal
+        self.isClicked = False
+
+        self.onChange = onChange
+        self.changeDelay = changeDelay
+        self.debounce = debounce
+        self.clock = clock
+        self.changePending = False
+        self.lastMoveTime = 0
+        self.lastChangeTime = None
+        self.sentVal = minVal
     
     def initialize(self, canvas):
         '''
@@ -413,15 +1357,135 @@ class HorizontalSlider(Sprite):
             self.sliderBg.initialize(canvas)
             self.sliderButton.initialize(canvas)
             self.initialized = True
+
+    def track(self, renderer):
+        '''
+        Hands the slider's parts to the canvas renderer
+        
+        :param self: n/a
+        :param renderer: the canvas renderer
+        '''
+        self.renderer = renderer
+        renderer.track(self.sliderBg)
+        renderer.track(self.sliderButton)
+
+    def redraw(self):
+        '''
+        Moves the slider's parts to the slider's position, keeping the button at the slider's value
+        
+        :param self: n/a
+        '''
+        self.sliderBg.change_pos(self.x, self.y)
+        self.sliderButton.change_pos(self.get_button_x(), self.y)
     
+    def get_bounds(self) -> tuple:
+        '''
+        Gets the bounding box of the part of the slider that can be clicked
+        
+        :param self: n/a
+        :return: (x0, y0, x1, y1)
+        :rtype: tuple
+        '''
+        return self.sliderButton.get_bounds()
+
+    def get_track_width(self) -> float:
+        '''
+        Gets how far the button can move, which is the bar minus the button so the button stays on the bar
+        
+        :param self: n/a
+        :return: the distance in pixels
+        :rtype: float
+        '''
+        return max(0, self.w-self.sliderButton.w)
+
+    def get_button_x(self) -> float:
+        '''
+        Gets where the button's left edge is for the current value
+        
+        :param self: n/a
+        :return: the x coordinate
+        :rtype: float
+        '''
+        if self.maxVal == self.minVal:
+            return self.x
+        return self.x + (self.sliderVal-self.minVal)/(self.maxVal-self.minVal)*self.get_track_width()
+
+    def clamp_value(self, value:float) -> float:
+        '''
+        Keeps a value between minVal and maxVal
+        
+        :param self: n/a
+        :param value: the value
+        :type value: float
+        :return: the closest value the slider can have
+        :rtype: float
+        '''
+        return min(max(value, min(self.minVal, self.maxVal)), max(self.minVal, self.maxVal))
+
+    def get_value(self) -> float:
+        '''
+        Gets the slider's value
+        
+        :param self: n/a
+        :return: the value, from minVal to maxVal
+        :rtype: float
+        '''
+        return self.sliderVal
+
+    def set_value(self, value:float, notify:bool=True):
+        '''
+        Sets the slider's value and moves the button to match
+        
+        :param self: n/a
+        :param value: the new value, kept between minVal and maxVal
+        :type value: float
+        :param notify: whether onChange should hear about it
+        :type notify: bool
+        '''
+        value = self.clamp_value(value)
+        if value == self.sliderVal:
+            return
+        self.sliderVal = value
+        if self.initialized:
+            self.sliderButton.change_pos(self.get_button_x(), self.y)
+        if not notify:
+            self.sentVal = value
+            return
+
+        self.changePending = True
+        self.lastMoveTime = self.clock()
+        self.poll_change()
+
+    def set_range(self, minVal:float, maxVal:float):
+        '''
+        Changes the values at the ends of the slider, keeping the value if it still fits
+        
+        :param self: n/a
+        :param minVal: the value with the button at the left end
+        :type minVal: float
+        :param maxVal: the value with the button at the right end
+        :type maxVal: float
+        '''
+        self.minVal = minVal
+        self.maxVal = maxVal
+        self.sliderVal = self.clamp_value(self.sliderVal)
+        self.sentVal = self.sliderVal
+        if self.initialized:
+            self.sliderButton.change_pos(self.get_button_x(), self.y)
+
     def move_slider(self, mouseX):
+        '''
+        Moves the button under the mouse, if the slider is being held
+        
+        :param self: n/a
+        :param mouseX: the x position of the mouse
+        '''
         if self.isClicked:
-            if mouseX < self.x:
-                self.sliderButton.change_pos(self.x, self.y)
-            elif mouseX > self.x+self.w:
-                self.sliderButton.change_pos(self.x+self.w, self.y)
-            else:
-                self.sliderButton.change_pos(mouseX, self.y)
+            trackWidth = self.get_track_width()
+            if trackWidth == 0:
+                return
+            fraction = (mouseX - self.sliderButton.w/2 - self.x)/trackWidth
+            self.set_value(self.minVal + fraction*(self.maxVal-self.minVal))
 
     def clicked(self, mouseX, mouseY):
         if (mouseX < self.sliderButton.x+self.sliderButton.w) and (mouseX > self.sliderButton.x):
@@ -432,7 +1496,43 @@ class HorizontalSlider(Sprite):
         return False
 
     def unClick(self):
+        '''
+        Lets go of the slider, sending any change that is still waiting
+        
+        :param self: n/a
+        '''
         self.isClicked = False
+        if self.changePending:
+            self.send_change()
+
+    def send_change(self):
+        '''
+        Calls onChange with the value, if it changed since the last call
+        
+        :param self: n/a
+        '''
+        self.changePending = False
+        self.lastChangeTime = self.clock()
+        if self.sliderVal == self.sentVal:
+            return
+        self.sentVal = self.sliderVal
+        if self.onChange is not None:
+            self.onChange(self.sliderVal)
+
+    def poll_change(self):
+        '''
+        Sends a waiting change once enough time has passed, called when the value moves and once a frame after
+        
+        :param self: n/a
+        '''
+        if not self.changePending:
+            return
+        now = self.clock()
+        if self.debounce:
+            if now - self.lastMoveTime >= self.changeDelay:
+                self.send_change()
+        elif self.lastChangeTime is None or now - self.lastChangeTime >= self.changeDelay:
+            self.send_change()
     
     def update(self, framesPassed):
         '''
@@ -443,13 +1543,12 @@ class HorizontalSlider(Sprite):
         '''
         super().base_update(framesPassed)
 
-        if not self.initialized:
-            return
-        
-        if self.wait <= 0:
-            pass
-
 class Text():
+    dX = WakeField()
+    dY = WakeField()
+    dChars = WakeField()
+    wait = WakeField()
+
     def __init__(self, text:str, width:int, x:int=0, y:int=0, font:str="Calibri", fontSize:int=50, color:str="#000000", justify:str="center", autoSize:bool=True, maxSize:int=100):
         '''
         Sets up a text sprite
@@ -503,6 +1602,9 @@ class Text():
         self.maxSize = maxSize
 
         self.initialized = False
+        self.renderer = None
+        self.visCanvas = None
+        self.sleepTimer = None
 
         self.auto_size_text()
     
@@ -530,6 +1632,39 @@ class Text():
             return
         
         self.wait = delayAmount
+        if self.visCanvas is not None:
+            self.visCanvas.sleep_sprite(self, delayAmount)
+
+    def get_frame(self) -> int:
+        '''
+        Gets the frame count of the canvas this text is on, or 0 if it isn't on one
+        
+        :param self: n/a
+        :return: the frame count
+        :rtype: int
+        '''
+        if self.visCanvas is None:
+            return 0
+        return self.visCanvas.framesPassed
+
+    def wake(self):
+        '''
+        Tells the canvas this text has something to animate, so it gets updated every frame until it comes to rest
+        
+        :param self: n/a
+        '''
+        if self.visCanvas is not None:
+            self.visCanvas.wake(self)
+
+    def is_resting(self) -> bool:
+        '''
+        Checks if updating this text would do nothing
+        
+        :param self: n/a
+        :return: true if the text has no delay, movement or typing left
+        :rtype: bool
+        '''
+        return self.wait <= 0 and self.dX == 0 and self.dY == 0 and self.dChars == 0
     
     def change_pos(self, newX:int, newY:int, duration:int=0):
         '''
@@ -550,24 +1685,29 @@ class Text():
         if duration == 0:
             self.x = newX
             self.y = newY
-            self.CANVAS.coords(self.label, self.x, self.y)
+            self.redraw()
         else:
-            self.endChange = duration
+            self.endChange = self.get_frame() + duration
             self.dX = (newX-self.x)/duration
             self.dY = (newY-self.y)/duration
+            self.wake()
     
-    def auto_size_text(self):
-        if self.autoSize:
-            if self.text == "":
+    def auto_size_text(self, text:str=None):
+        '''
+        Fits the font size to the width of the text box, if auto sizing is on
+        
+        :param self: n/a
+        :param text: the text to fit, defaults to the shown text
+        :type text: str
+        '''
+        if text is None:
+            text = self.text
+        if self.autoSize and self.initialized:
+            if text == "":
                 return
-            currFont = tkFont.Font(family=self.font, size=self.fontSize)
-            textWidth = currFont.measure(self.text)
-            scale = self.width/textWidth
-
-            newFontSize = int(self.fontSize * scale)
-            if newFontSize > self.maxSize:
-                newFontSize = self.maxSize
-            self.change_font_size(newFontSize)
+            # canvases that don't draw with tkinter bring their own font measurements
+            metrics = getattr(self.CANVAS, "fontMetrics", FONT_METRICS)
+            self.change_font_size(metrics.fit_size(text, self.width, self.font, self.fontSize, self.maxSize))
     
     def change_text(self, newText:str, duration:int=0):
         '''
@@ -584,13 +1724,75 @@ class Text():
         
         if duration == 0:
             self.text = newText
-            self.CANVAS.itemconfig(self.label, text=newText)
+            self.redraw()
+            self.auto_size_text()
         else:
             self.dChars = (len(newText)+len(self.text))/duration
             self.targetText = newText
             self.deletingChars = True
             self.charIdx = len(self.text)
+            # sized once for the final text so the animation doesn't change size every frame
+            self.auto_size_text(newText)
+            self.wake()
+
+    def set_shown_text(self, newText:str):
+        '''
+        Changes the shown text by deleting and inserting only the characters that differ at the end, instead of sending the whole string
+        
+        :param self: n/a
+        :param newText: the text to show
+        :type newText: str
+        '''
+        keep = 0
+        maxKeep = min(len(self.text), len(newText))
+        if newText[:maxKeep] == self.text[:maxKeep]:
+            keep = maxKeep
+        else:
+            while self.text[keep] == newText[keep]:
+                keep += 1
+        self.edit_span(keep, len(self.text)-keep, newText[keep:])
+
+    def edit_span(self, start:int, deleteCount:int, insertText:str):
+        '''
+        Replaces a span of the shown text, sending only the change to tkinter
+        
+        :param self: n/a
+        :param start: the index of the first changed character
+        :type start: int
+        :param deleteCount: the number of characters deleted from start
+        :type deleteCount: int
+        :param insertText: the characters inserted at start
+        :type insertText: str
+        '''
+        newText = self.text[:start] + insertText + self.text[start+deleteCount:]
+        if self.renderer is not None:
+            if not self.renderer.edit_text(self, self.label, self.text, start, deleteCount, insertText):
+                # tkinter doesn't have the current text yet, so send all of it
+                self.text = newText
+                self.redraw()
+                return
+        else:
+            if deleteCount > 0:
+                self.CANVAS.dchars(self.label, start, start+deleteCount-1)
+            if len(insertText) > 0:
+                self.CANVAS.insert(self.label, start, insertText)
+        self.text = newText
+
+    def replace_span(self, start:int, deleteCount:int, insertText:str):
+        '''
+        Replaces a span of the text, eg when a bound text input is edited, then fits the font size if auto sizing is on
         
+        :param self: n/a
+        :param start: the index of the first changed character
+        :type start: int
+        :param deleteCount: the number of characters deleted from start
+        :type deleteCount: int
+        :param insertText: the characters inserted at start
+        :type insertText: str
+        '''
+        if not self.initialized:
+            return
+        self.edit_span(start, deleteCount, insertText)
         self.auto_size_text()
 
     def change_color(self, newColor:str):
@@ -604,7 +1806,8 @@ class Text():
         if not self.initialized:
             return
         
-        self.CANVAS.itemconfig(self.label, fill=newColor)
+        self.color = newColor
+        self.redraw()
         
     def change_font_type(self, newFont):
         '''
@@ -617,7 +1820,7 @@ class Text():
             return
         
         self.font = newFont
-        self.CANVAS.itemconfig(self.label, font=(self.font, self.fontSize))    
+        self.redraw()
         
     def change_font_size(self, newFontSize):
         '''
@@ -630,7 +1833,30 @@ class Text():
             return
         
         self.fontSize = newFontSize
-        self.CANVAS.itemconfig(self.label, font=(self.font, self.fontSize))
+        self.redraw()
+
+    def redraw(self):
+        '''
+        Marks the text as changed, or sends it to tkinter right away if it has no renderer
+        
+        :param self: n/a
+        '''
+        if self.renderer is not None:
+            self.renderer.mark_dirty(self)
+        else:
+            item, coords, config = self.render_state()
+            self.CANVAS.coords(item, *coords)
+            self.CANVAS.itemconfig(item, **config)
+
+    def render_state(self) -> tuple:
+        '''
+        Gets what tkinter should be showing for this text
+        
+        :param self: n/a
+        :return: the item id, the coords and the item options
+        :rtype: tuple
+        '''
+        return self.label, (self.x, self.y), {"fill":self.color, "text":self.text, "font":(self.font, self.fontSize)}
 
     def update(self, framesPassed:int):
         '''
@@ -657,157 +1883,1328 @@ class Text():
                 if self.deletingChars:
                     if len(self.text) <= self.dChars:
                         self.deletingChars = False
-                        self.change_text("")
+                        self.set_shown_text("")
                     else:
                         self.charIdx -= self.dChars
-                        self.change_text(self.text[:int(self.charIdx)])
+                        self.set_shown_text(self.text[:int(self.charIdx)])
                 else:
                     self.charIdx += self.dChars
                     if self.charIdx >= len(self.targetText):
                         self.dChars = 0
-                        self.change_text(self.targetText)
+                        self.set_shown_text(self.targetText)
                     else:
-                        self.change_text(self.targetText[:int(self.charIdx)])
+                        self.set_shown_text(self.targetText[:int(self.charIdx)])
 
 class Button():
     def __init__(self, attachedSprite, returnSignal):
         self.attachedSprite = attachedSprite
         self.returnSignal = returnSignal
     
+        self.hovered = False
+
+    def get_bounds(self) -> tuple:
+        return self.attachedSprite.get_bounds()
+    
     def clicked(self, mouseX, mouseY) -> bool:
-        if type(self.attachedSprite) == Dot:
-            if (mouseX < self.attachedSprite.x+self.attachedSprite.r) and (mouseX > self.attachedSprite.x-self.attachedSprite.r):
-                if (mouseY < self.attachedSprite.y+self.attachedSprite.r) and (mouseY > self.attachedSprite.y-self.attachedSprite.r):
-                    return True
-        else:
-            if (mouseX < self.attachedSprite.x+self.attachedSprite.w) and (mouseX > self.attachedSprite.x):
-                if (mouseY < self.attachedSprite.y+self.attachedSprite.h) and (mouseY > self.attachedSprite.y):
-                    return True
-        return False
+        x0, y0, x1, y1 = self.attachedSprite.get_bounds()
+        return (x0 < mouseX < x1) and (y0 < mouseY < y1)
 
     def getSignal(self):
         return self.returnSignal
 
-class VisCanvas():
-    def __init__(self, canvas, screenWidth:int, screenHeight:int):
+class InputEvent():
+    def __init__(self, kind:str, x:int=0, y:int=0, keysym:str="", signals:list=[]):
         '''
-        Creates a Canvas
+        Holds one queued mouse or keyboard event, named like the tkinter event it came from
         
         :param self: n/a
-        :param canvas: the tkinter canvas
-        :param screenWidth: the width of the screen
-        :type screenWidth: int
-        :param screenHeight: the height of the screen
-        :type screenHeight: int
+        :param kind: "click", "motion", "drag", "release" or "key"
+        :type kind: str
+        :param x: the x position of the mouse
+        :type x: int
+        :param y: the y position of the mouse
+        :type y: int
+        :param keysym: the key for key events
+        :type keysym: str
+        :param signals: the signals of the buttons that were clicked or hovered
+        :type signals: list
         '''
-        self.canvas = canvas
-        self.width = screenWidth
-        self.height = screenHeight
+        self.kind = kind
+        self.x = x
+        self.y = y
+        self.keysym = keysym
+        self.signals = signals
+
+class TextBuffer():
+    '''
+    Gap buffer holding text being typed. The characters are kept in a list with an empty gap at the cursor, so typing and deleting at the cursor only touch the gap
+    '''
+    def __init__(self, capacity:int=64):
+        '''
+        Sets up an empty buffer
+        
+        :param self: n/a
+        :param capacity: the starting size of the gap, which doubles whenever it runs out
+        :type capacity: int
+        '''
+        self.chars = [""] * capacity
+        self.gapStart = 0
+        self.gapEnd = capacity
+        self.listeners = []
 
-        self.framesPassed = 0
+    def __len__(self) -> int:
+        return len(self.chars) - (self.gapEnd-self.gapStart)
 
-        self.allSprites = []
-        self.allButtons = []
-        self.allSliders = []
-        self.taggedSprites = {}
-        self.numSprites = 0
+    def get_text(self) -> str:
+        return "".join(self.chars[:self.gapStart]) + "".join(self.chars[self.gapEnd:])
 
-        self.paused = False
-        self.takingTextInputDuringPause = False
-        self.takingTextInput = False
-        self.endOnExitKey = False
+    def get_cursor(self) -> int:
+        return self.gapStart
 
-        self.textInput = ""
-        self.shiftDown = True
-        self.capsLock = False
+    def add_listener(self, listener):
+        '''
+        Adds a function called after every edit with the index of the edit, the number of characters deleted there and the characters inserted there
+        
+        :param self: n/a
+        :param listener: a function taking (start, deleteCount, insertText)
+        '''
+        self.listeners.append(listener)
 
-    def update(self):
+    def notify(self, start:int, deleteCount:int, insertText:str):
+        for listener in self.listeners:
+            listener(start, deleteCount, insertText)
+
+    def insert(self, text:str):
         '''
-        Updates all sprites attached to this canvas
+        Types text at the cursor, leaving the cursor after it
         
         :param self: n/a
+        :param text: the text to type
+        :type text: str
         '''
-        if not self.paused:
-            self.framesPassed += 1
+        if len(text) == 0:
+            return
+        gapSize = self.gapEnd - self.gapStart
+        if len(text) > gapSize:
+            grow = max(len(self.chars), len(text)-gapSize)
+            self.chars[self.gapEnd:self.gapEnd] = [""] * grow
+            self.gapEnd += grow
+        start = self.gapStart
+        self.chars[start:start+len(text)] = list(text)
+        self.gapStart += len(text)
+        self.notify(start, 0, text)
+
+    def delete_before(self, count:int=1):
+        '''
+        Deletes characters before the cursor, like backspace
+        
+        :param self: n/a
+        :param count: the number of characters
+        :type count: int
+        '''
+        count = min(count, self.gapStart)
+        if count <= 0:
+            return
+        self.gapStart -= count
+        self.notify(self.gapStart, count, "")
 
-            for sprite in self.allSprites:
-                sprite.update(self.framesPassed)
-        else:
-            pass
+    def delete_after(self, count:int=1):
+        '''
+        Deletes characters after the cursor, like the delete key
+        
+        :param self: n/a
+        :param count: the number of characters
+        :type count: int
+        '''
+        count = min(count, len(self.chars)-self.gapEnd)
+        if count <= 0:
+            return
+        self.gapEnd += count
+        self.notify(self.gapStart, count, "")
 
-    def add_sprite(self, newSprite, tags:list|str=[]):
+    def move_cursor(self, offset:int):
         '''
-        Adds a sprite to this canvas to finish initializing it
+        Moves the cursor left (negative) or right (positive), shifting only the characters it passes over
         
         :param self: n/a
-        :param newSprite: the sprite that has been added
-        :param tags: a list of string tags that apply to the sprite
-        :type tags: list
+        :param offset: the number of characters to move
+        :type offset: int
         '''
+        self.set_cursor(self.gapStart+offset)
 
-        newSprite.initialize(self.canvas)
-        self.allSprites.append(newSprite)
-        if type(newSprite) == Button:
-            self.allButtons.append(newSprite)
-        elif type(newSprite) == HorizontalSlider:
-            self.allSliders.append(newSprite)
+    def set_cursor(self, index:int):
+        '''
+        Moves the cursor to an index
+        
+        :param self: n/a
+        :param index: the index, clamped to the text
+        :type index: int
+        '''
+        index = max(0, min(index, len(self)))
+        if index < self.gapStart:
+            count = self.gapStart - index
+            self.chars[self.gapEnd-count:self.gapEnd] = self.chars[index:self.gapStart]
+            self.gapStart -= count
+            self.gapEnd -= count
+        elif index > self.gapStart:
+            count = index - self.gapStart
+            self.chars[self.gapStart:index] = self.chars[self.gapEnd:self.gapEnd+count]
+            self.gapStart += count
+            self.gapEnd += count
+
+    def clear(self):
+        '''
+        Deletes all the text
+        
+        :param self: n/a
+        '''
+        length = len(self)
+        self.gapStart = 0
+        self.gapEnd = len(self.chars)
+        if length > 0:
+            self.notify(0, length, "")
+
+class SpritePool():
+    '''
+    Keeps released Dot and Rect sprites hidden along with their canvas items, so short lived sprites can reuse them instead of creating new items
+    '''
+    ITEM_ATTRS = {"Dot": "dot", "Rect": "rect"}
+
+    def __init__(self, maxFree:int=1024):
+        '''
+        Sets up an empty pool
+        
+        :param self: n/a
+        :param maxFree: the most hidden sprites kept for each class
+        :type maxFree: int
+        '''
+        self.maxFree = maxFree
+        self.free = {}
 
-        if type(tags) == str:
-            # just one tag
-            if tags in self.taggedSprites.keys():
-                self.taggedSprites[tags].append(newSprite)
-            else:
-                self.taggedSprites[tags] = [newSprite]
-        else:
-            # possibly multiple tags
-            for tag in tags:
-                if tag in self.taggedSprites.keys():
-                    self.taggedSprites[tag].append(newSprite)
-                else:
-                    self.taggedSprites[tag] = [newSprite]
-    
-    def add_button_and_sprite(self, attachedSprite, returnSignal, tags:list|str=[]):
-        self.add_sprite(attachedSprite, tags)
+    def can_pool(self, sprite) -> bool:
+        return type(sprite).__name__ in self.ITEM_ATTRS
 
-        newButton = Button(attachedSprite, returnSignal)
-        self.allButtons.append(newButton)
+    def put(self, sprite) -> bool:
+        '''
+        Keeps a released sprite if there's room
+        
+        :param self: n/a
+        :param sprite: the released Dot or Rect
+        :return: true if the sprite was kept
+        :rtype: bool
+        '''
+        free = self.free.setdefault(type(sprite), [])
+        if len(free) >= self.maxFree:
+            return False
+        free.append(sprite)
+        return True
 
-    def get_sprites_with_tag(self, tag:str) -> list:
+    def take(self, spriteClass, *args, **kwargs):
         '''
-        Returns a list of all sprites with the given tag
+        Gets a kept sprite set up as if it were just created with the given arguments, keeping its canvas item
         
         :param self: n/a
-        :param tag: the desired tag
-        :type tag: str
-        :return: all sprites with the given tag
-        :rtype: list
+        :param spriteClass: Dot or Rect
+        :return: the sprite, or None if none are kept
         '''
-        return self.taggedSprites[tag]
-    
-    def check_collision(self, cX1, cY1, w1, h1, cX2, cY2, w2, h2) -> bool:
-        retVal = False
-        if cX1 > cX2 and cX1 < (cX2 + w2):
-            if cY1 > cY2 and cY1 < (cY2 + h2):
-                retVal = True
-        elif cX2 > cX1 and cX2 < (cX1 + w1):
-            if cY2 > cY1 and cY2 < (cY1 + h1):
-                retVal = True
-        return retVal
+        free = self.free.get(spriteClass)
+        if not free:
+            return None
+        sprite = free.pop()
+        itemAttr = self.ITEM_ATTRS[spriteClass.__name__]
+        canvas = sprite.CANVAS
+        item = getattr(sprite, itemAttr)
+
+        sprite.__init__(*args, **kwargs)
+        sprite.CANVAS = canvas
+        setattr(sprite, itemAttr, item)
+        sprite.initialized = True
+        return sprite
+
+class FrameProfiler():
+    '''
+    Keeps the recent per-frame timings of each phase and sprite class so their percentiles can be shown or saved
+    '''
+    def __init__(self, window:int=300, clock=time.perf_counter):
+        '''
+        Sets up an empty profiler
+        
+        :param self: n/a
+        :param window: the number of frames each statistic is kept for
+        :type window: int
+        :param clock: a function returning the time in seconds
+        '''
+        self.window = window
+        self.clock = clock
+        self.samples = {}
+        self.frames = 0
 
-    def start_text_input(self, pause=True, endOnExitKey=True):
+    def record(self, name:str, value:float):
         '''
-        Starts taking text input to get a text entry
+        Adds one frame's value to a statistic
         
         :param self: n/a
-        :param pause: if true, pauses all other updates until done taking text input
-        :param endOnEnter: if true, the text entry ends when the user hits enter/return
+        :param name: the statistic, eg "step" or "class:Dot"
+        :type name: str
+        :param value: the value, in milliseconds for timings
+        :type value: float
         '''
-        self.paused = pause
-        self.takingTextInputDuringPause = pause
-        self.takingTextInput = True
-        self.endOnExitKey = endOnExitKey
+        if name not in self.samples:
+            self.samples[name] = deque(maxlen=self.window)
+        self.samples[name].append(value)
 
-        self.textInput = ""
+    def record_time(self, name:str, seconds:float):
+        '''
+        Adds one frame's timing to a statistic
+        
+        :param self: n/a
+        :param name: the statistic
+        :type name: str
+        :param seconds: the time taken in seconds
+        :type seconds: float
+        '''
+        self.record(name, seconds*1000)
+
+    def get_stats(self, name:str) -> dict:
+        '''
+        Gets the mean and 50th, 95th and 99th percentiles of a statistic over the recent frames
+        
+        :param self: n/a
+        :param name: the statistic
+        :type name: str
+        :return: a dictionary with mean, p50, p95 and p99
+        :rtype: dict
+        '''
+        values = np.fromiter(self.samples.get(name, []), dtype=np.float64)
+        if len(values) == 0:
+            return {"mean": 0, "p50": 0, "p95": 0, "p99": 0}
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        return {"mean": float(values.mean()), "p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+    def get_all_stats(self) -> dict:
+        '''
+        Gets the stats of every statistic
+        
+        :param self: n/a
+        :return: the stats of each statistic by name
+        :rtype: dict
+        '''
+        return {name: self.get_stats(name) for name in self.samples}
+
+    def summary_text(self, fps:float=0) -> str:
+        '''
+        Gets a short multi-line summary for the stats overlay
+        
+        :param self: n/a
+        :param fps: the achieved fps to show
+        :type fps: float
+        :return: the summary
+        :rtype: str
+        '''
+        lines = ["fps "+str(round(fps, 1))]
+        for name in sorted(self.samples):
+            stats = self.get_stats(name)
+            lines.append(name+" p50 "+str(round(stats["p50"], 2))+" p95 "+str(round(stats["p95"], 2))+" p99 "+str(round(stats["p99"], 2)))
+        return "\n".join(lines)
+
+    def export(self, filePath:str):
+        '''
+        Saves the stats and the recent values of every statistic to a JSON file
+        
+        :param self: n/a
+        :param filePath: the file to write
+        :type filePath: str
+        '''
+        data = {
+            "frames": self.frames,
+            "window": self.window,
+            "stats": self.get_all_stats(),
+            "samples": {name: list(values) for name, values in self.samples.items()}
+        }
+        with open(filePath, "w") as file:
+            json.dump(data, file, indent=2)
+
+class FrameScheduler():
+    '''
+    Runs simulation steps at a fixed rate against the wall clock and draws once per tick. When it falls behind it catches up on steps and skips draws, so simulation time never slows down
+    '''
+    PHASES = ["callback", "step", "render"]
+
+    def __init__(self, visCanvas, fps:float, onStep=None, maxSteps:int=5, maxSkippedRenders:int=5, window:int=120, clock=time.perf_counter):
+        '''
+        Sets up a scheduler
+        
+        :param self: n/a
+        :param visCanvas: the VisCanvas to step and draw
+        :param fps: the number of simulation steps per second
+        :type fps: float
+        :param onStep: a function with no arguments called before each simulation step
+        :param maxSteps: the most steps run in one tick, anything further behind is dropped
+        :type maxSteps: int
+        :param maxSkippedRenders: the most draws in a row that can be skipped while behind
+        :type maxSkippedRenders: int
+        :param window: the number of frames the timings are averaged over
+        :type window: int
+        :param clock: a function returning the time in seconds
+        '''
+        self.visCanvas = visCanvas
+        self.stepTime = 1/fps
+        self.onStep = onStep
+        self.maxSteps = maxSteps
+        self.maxSkippedRenders = maxSkippedRenders
+        self.clock = clock
+
+        self.running = False
+        self.nextStep = 0
+        self.skippedRenders = 0
+        self.droppedTime = 0
+
+        self.stepCount = 0
+        self.renderCount = 0
+        self.skipCount = 0
+        self.renderTimes = deque(maxlen=window)
+        self.timings = {phase: deque(maxlen=window) for phase in self.PHASES}
+
+    def start(self):
+        '''
+        Starts ticking, with the first step due now
+        
+        :param self: n/a
+        '''
+        self.running = True
+        self.nextStep = self.clock()
+        self.tick()
+
+    def stop(self):
+        '''
+        Stops ticking after the current tick
+        
+        :param self: n/a
+        '''
+        self.running = False
+
+    def timed(self, phase:str, func):
+        '''
+        Calls a function and records how long it took
+        
+        :param self: n/a
+        :param phase: the phase the time is recorded under
+        :type phase: str
+        :param func: the function to call
+        '''
+        t = self.clock()
+        func()
+        self.timings[phase].append(self.clock()-t)
+        if phase == "callback" and self.visCanvas.profiler is not None:
+            self.visCanvas.profiler.record_time(phase, self.timings[phase][-1])
+
+    def tick(self):
+        '''
+        Runs every simulation step that is due, draws if there's time and schedules the next tick
+        
+        :param self: n/a
+        '''
+        if not self.running:
+            return
+
+        steps = 0
+        while self.clock() >= self.nextStep and steps < self.maxSteps:
+            if self.onStep is not None:
+                self.timed("callback", self.onStep)
+            self.timed("step", self.visCanvas.step)
+            self.nextStep += self.stepTime
+            self.stepCount += 1
+            steps += 1
+
+        now = self.clock()
+        if now >= self.nextStep and steps == self.maxSteps:
+            # too far behind to catch up, so let the missed steps go
+            self.droppedTime += now - self.nextStep
+            self.nextStep = now + self.stepTime
+
+        if steps > 0:
+            if now >= self.nextStep and self.skippedRenders < self.maxSkippedRenders:
+                # the next step is already due, so skip this draw
+                self.skippedRenders += 1
+                self.skipCount += 1
+            else:
+                self.timed("render", self.visCanvas.render)
+                self.skippedRenders = 0
+                self.renderCount += 1
+                self.renderTimes.append(self.clock())
+
+        delay = max(0, math.ceil((self.nextStep-self.clock())*1000))
+        self.visCanvas.canvas.after(delay, self.tick)
+
+    def get_fps(self) -> float:
+        '''
+        Gets the number of draws per second over the recent frames
+        
+        :param self: n/a
+        :return: the achieved fps
+        :rtype: float
+        '''
+        if len(self.renderTimes) < 2:
+            return 0
+        return (len(self.renderTimes)-1)/(self.renderTimes[-1]-self.renderTimes[0])
+
+    def get_timings(self) -> dict:
+        '''
+        Gets the average time of each phase over the recent frames
+        
+        :param self: n/a
+        :return: the average milliseconds of each phase
+        :rtype: dict
+        '''
+        return {phase: 1000*sum(times)/len(times) if len(times) > 0 else 0 for phase, times in self.timings.items()}
+
+class VisCanvas():
+    def __init__(self, canvas, screenWidth:int, screenHeight:int, arrayEngine:bool=False):
+        '''
+        Creates a Canvas
+        
+        :param self: n/a
+        :param canvas: the tkinter canvas
+        :param screenWidth: the width of the screen
+        :type screenWidth: int
+        :param screenHeight: the height of the screen
+        :type screenHeight: int
+        :param arrayEngine: if true, dots and rects are stored in a SpriteEngine and stepped together each frame
+        :type arrayEngine: bool
+        '''
+        self.canvas = canvas
+        self.width = screenWidth
+        self.height = screenHeight
+
+        self.framesPassed = 0
+        self.scheduler = None
+        self.profiler = None
+        self.profilerOverlay = None
+        self.overlayEvery = 15
+
+        self.renderer = Renderer(canvas)
+        self.engine = SpriteEngine() if arrayEngine else None
+        self.engineChanged = np.zeros(0, dtype=np.int64)
+        # dictionaries are used as ordered sets so sprites can be removed quickly
+        self.otherSprites = {}
+
+        self.allSprites = {}
+        self.activeSprites = {}
+        self.timers = []
+        self.timerCount = 0
+        self.cancelledTimers = set()
+        self.allButtons = []
+        self.allSliders = []
+        self.hitGrid = SpatialGrid()
+        self.hitOwners = {}
+        self.hitOrder = {}
+        self.hitCount = 0
+        self.hoveredButtons = []
+        self.clickedSliders = []
+        self.walls = SpatialGrid()
+        self.tags = TagIndex()
+        self.pool = SpritePool()
+        self.numSprites = 0
+
+        self.paused = False
+        self.takingTextInputDuringPause = False
+        self.takingTextInput = False
+        self.endOnExitKey = False
+
+        self.textBuffer = TextBuffer()
+        self.inputQueue = deque()
+        self.inputListeners = {}
+        self.shiftDown = True
+        self.capsLock = False
+
+    def update(self):
+        '''
+        Updates all sprites attached to this canvas and draws them
+        
+        :param self: n/a
+        '''
+        self.step()
+        self.render()
+
+    def step(self):
+        '''
+        Handles queued input, then runs one simulation step without drawing
+        
+        :param self: n/a
+        '''
+        self.dispatch_input()
+        if not self.paused:
+            startTime = time.perf_counter()
+            self.framesPassed += 1
+            self.run_timers()
+
+            if self.engine is None:
+                active = list(self.activeSprites)
+                previous = {}
+                if len(self.walls.bounds) > 0:
+                    for sprite in active:
+                        if isinstance(sprite, (Dot, Rect)):
+                            previous[sprite] = (sprite.x, sprite.y)
+                self.update_sprites(active)
+                self.resolve_contacts(active, previous)
+                self.settle_sprites(active)
+            else:
+                self.update_engine()
+
+            if self.profiler is not None:
+                self.profiler.record_time("step", time.perf_counter()-startTime)
+
+    def render(self):
+        '''
+        Sends everything that changed since the last draw to tkinter
+        
+        :param self: n/a
+        '''
+        startTime = time.perf_counter()
+        startCalls = self.renderer.tkCalls
+        if self.engine is not None:
+            self.refresh_hit_boxes(self.flush_engine())
+        self.refresh_hit_boxes(self.renderer.flush())
+
+        if self.profiler is not None:
+            self.profiler.record_time("render", time.perf_counter()-startTime)
+            self.profiler.record("tkCalls", self.renderer.tkCalls-startCalls)
+            self.profiler.frames += 1
+            if self.profilerOverlay is not None and self.profiler.frames % self.overlayEvery == 0:
+                self.profilerOverlay.change_text(self.profiler.summary_text(self.get_fps()))
+
+    def wake(self, sprite):
+        '''
+        Adds a sprite to the ones updated every frame. Sprite methods that start an animation call this, and so does setting a velocity, delay or gravity directly
+        
+        :param self: n/a
+        :param sprite: the sprite
+        '''
+        if sprite in self.allSprites and getattr(sprite, "engine", None) is None and sprite.sleepTimer is None:
+            # engine sprites are all stepped together anyway, and sleeping sprites wake when their timer runs
+            self.activeSprites[sprite] = None
+
+    def schedule(self, frames:int, callback) -> int:
+        '''
+        Runs a callback at the start of the step that is the given number of frames from now, before any sprites are updated
+        
+        :param self: n/a
+        :param frames: the number of frames from now, where 1 is the next step
+        :type frames: int
+        :param callback: a function with no arguments
+        :return: an id that can be given to cancel_timer
+        :rtype: int
+        '''
+        self.timerCount += 1
+        heapq.heappush(self.timers, (self.framesPassed+max(1, frames), self.timerCount, callback))
+        return self.timerCount
+
+    def cancel_timer(self, timerId:int):
+        '''
+        Stops a scheduled callback from running
+        
+        :param self: n/a
+        :param timerId: the id returned by schedule
+        :type timerId: int
+        '''
+        self.cancelledTimers.add(timerId)
+
+    def run_timers(self):
+        '''
+        Runs every scheduled callback that is due, in the order they are due
+        
+        :param self: n/a
+        '''
+        while len(self.timers) > 0 and self.timers[0][0] <= self.framesPassed:
+            _, timerId, callback = heapq.heappop(self.timers)
+            if timerId in self.cancelledTimers:
+                self.cancelledTimers.discard(timerId)
+                continue
+            callback()
+
+    def sleep_sprite(self, sprite, delayAmount:int):
+        '''
+        Stops updating a sprite for a number of frames, using a timer instead of counting down every frame
+        
+        :param self: n/a
+        :param sprite: the sprite
+        :param delayAmount: the delay length in frames
+        :type delayAmount: int
+        '''
+        if sprite not in self.allSprites or getattr(sprite, "engine", None) is not None:
+            # engine sprites count their waits down together
+            self.wake(sprite)
+            return
+
+        if sprite.sleepTimer is not None:
+            self.cancel_timer(sprite.sleepTimer)
+            sprite.sleepTimer = None
+        if delayAmount <= 0:
+            sprite.wait = 0
+            self.wake(sprite)
+            return
+
+        self.activeSprites.pop(sprite, None)
+        startFrame = self.framesPassed
+        def end_sleep():
+            # wakes for the last frame of the delay and lets the update count it down, since sizes already change on that frame
+            sprite.sleepTimer = None
+            sprite.wait = 1
+            # like counting down, a delay pushes back the end of a position change
+            sprite.endChange += self.framesPassed-1-startFrame
+            self.wake(sprite)
+        sprite.sleepTimer = self.schedule(delayAmount, end_sleep)
+
+    def settle_sprites(self, sprites:list):
+        '''
+        Stops updating the given sprites that have come to rest
+        
+        :param self: n/a
+        :param sprites: the sprites that were just updated
+        :type sprites: list
+        '''
+        for sprite in sprites:
+            if sprite.is_resting():
+                self.activeSprites.pop(sprite, None)
+
+    def update_sprites(self, sprites:list):
+        '''
+        Updates each sprite, timing each sprite class when profiling
+        
+        :param self: n/a
+        :param sprites: the sprites to update
+        :type sprites: list
+        '''
+        if self.profiler is None:
+            for sprite in sprites:
+                sprite.update(self.framesPassed)
+            return
+
+        classTimes = {}
+        for sprite in sprites:
+            startTime = time.perf_counter()
+            sprite.update(self.framesPassed)
+            name = type(sprite).__name__
+            classTimes[name] = classTimes.get(name, 0) + time.perf_counter()-startTime
+        for name, seconds in classTimes.items():
+            self.profiler.record_time("class:"+name, seconds)
+
+    def enable_profiling(self, window:int=300, overlay:bool=False, overlayColor:str="#0F0") -> FrameProfiler:
+        '''
+        Starts timing each phase and sprite class every frame, optionally showing live stats in the top left corner
+        
+        :param self: n/a
+        :param window: the number of frames each statistic is kept for
+        :type window: int
+        :param overlay: if true, a text sprite showing the stats is added
+        :type overlay: bool
+        :param overlayColor: a hex code for the color of the overlay text
+        :type overlayColor: str
+        :return: the profiler
+        :rtype: FrameProfiler
+        '''
+        self.profiler = FrameProfiler(window)
+        if overlay and self.profilerOverlay is None:
+            self.profilerOverlay = Text("", self.width, 5, 5, font="Courier", fontSize=10, color=overlayColor, justify="left", autoSize=False)
+            self.add_sprite(self.profilerOverlay, "profiler")
+        return self.profiler
+
+    def export_profile(self, filePath:str):
+        '''
+        Saves the profiling stats to a JSON file
+        
+        :param self: n/a
+        :param filePath: the file to write
+        :type filePath: str
+        '''
+        if self.profiler is not None:
+            self.profiler.export(filePath)
+
+    def update_engine(self):
+        '''
+        Steps all engine sprites in one pass and remembers which ones changed, then updates the remaining sprites one at a time
+        
+        :param self: n/a
+        '''
+        startTime = time.perf_counter()
+        n = self.engine.count
+        previousX = self.engine.arrays["x"][:n].copy()
+        previousY = self.engine.arrays["y"][:n].copy()
+        changed = self.engine.step(self.framesPassed)
+        if len(self.walls.bounds) > 0:
+            physicsSprites = self.engine.get_physics_sprites()
+            previous = {}
+            for sprite in physicsSprites:
+                previous[sprite] = (float(previousX[sprite.engineIdx]), float(previousY[sprite.engineIdx]))
+            self.resolve_contacts(physicsSprites, previous)
+        self.engineChanged = np.union1d(self.engineChanged, changed)
+
+        for rect in self.engine.rects:
+            if rect.dW != 0 or rect.dH != 0:
+                rect.update_size()
+        if self.profiler is not None:
+            self.profiler.record_time("class:SpriteEngine", time.perf_counter()-startTime)
+
+        active = list(self.activeSprites)
+        self.update_sprites(active)
+        self.settle_sprites(active)
+
+    def flush_engine(self) -> list:
+        '''
+        Pushes the coords of every engine sprite that changed since the last draw to tkinter
+        
+        :param self: n/a
+        :return: the engine sprites whose coords changed
+        :rtype: list
+        '''
+        changed = self.engineChanged
+        self.engineChanged = np.zeros(0, dtype=np.int64)
+        allCoords = self.engine.get_coords(changed)
+        moved = []
+        for idx, coords in zip(changed.tolist(), allCoords):
+            if self.renderer.set_coords(self.engine.itemIds[idx], coords):
+                moved.append(self.engine.sprites[idx])
+        return moved
+
+    def run(self, fps:float, onStep=None) -> FrameScheduler:
+        '''
+        Starts stepping and drawing this canvas on its own with a FrameScheduler
+        
+        :param self: n/a
+        :param fps: the number of simulation steps per second
+        :type fps: float
+        :param onStep: a function with no arguments called before each simulation step
+        :return: the scheduler
+        :rtype: FrameScheduler
+        '''
+        if self.scheduler is not None:
+            self.scheduler.stop()
+        self.scheduler = FrameScheduler(self, fps, onStep)
+        self.scheduler.start()
+        return self.scheduler
+
+    def get_fps(self) -> float:
+        '''
+        Gets the achieved draws per second, or 0 if the canvas isn't being run
+        
+        :param self: n/a
+        :return: the achieved fps
+        :rtype: float
+        '''
+        if self.scheduler is None:
+            return 0
+        return self.scheduler.get_fps()
+
+    def get_frame_timings(self) -> dict:
+        '''
+        Gets the average milliseconds of the callback, step and render phases, or an empty dictionary if the canvas isn't being run
+        
+        :param self: n/a
+        :return: the average milliseconds of each phase
+        :rtype: dict
+        '''
+        if self.scheduler is None:
+            return {}
+        return self.scheduler.get_timings()
+
+    def refresh_hit_boxes(self, movedSprites:list):
+        '''
+        Moves the hit boxes of any buttons and sliders whose sprites moved
+        
+        :param self: n/a
+        :param movedSprites: the sprites that moved this frame
+        :type movedSprites: list
+        '''
+        if len(self.hitOwners) == 0:
+            return
+        for sprite in movedSprites:
+            for hittable in self.hitOwners.get(sprite, []):
+                self.hitGrid.insert(hittable, hittable.get_bounds())
+
+    def add_hittable(self, hittable, sprite):
+        '''
+        Adds a button or slider to the hit-test grid
+        
+        :param self: n/a
+        :param hittable: the button or slider
+        :param sprite: the sprite whose movement moves the hit box
+        '''
+        # a running count, so orders stay unique after hittables are removed
+        self.hitCount += 1
+        self.hitOrder[hittable] = self.hitCount
+        self.hitOwners.setdefault(sprite, []).append(hittable)
+        self.hitGrid.insert(hittable, hittable.get_bounds())
+
+    def get_hits(self, x:float, y:float) -> list:
+        '''
+        Gets the buttons and sliders whose grid cell holds a point, in the order they were added
+        
+        :param self: n/a
+        :param x: the x coordinate
+        :type x: float
+        :param y: the y coordinate
+        :type y: float
+        :return: the candidate buttons and sliders
+        :rtype: list
+        '''
+        return sorted(self.hitGrid.query_point(x, y), key=self.hitOrder.__getitem__)
+
+    def add_sprite(self, newSprite, tags:list|str=[]):
+        '''
+        Adds a sprite to this canvas to finish initializing it
+        
+        :param self: n/a
+        :param newSprite: the sprite that has been added
+        :param tags: a list of string tags that apply to the sprite
+        :type tags: list
+        '''
+
+        newSprite.initialize(self.canvas)
+        newSprite.visCanvas = self
+        if isinstance(newSprite, HorizontalSlider):
+            newSprite.track(self.renderer)
+        else:
+            self.renderer.track(newSprite)
+        self.allSprites[newSprite] = None
+        if self.engine is not None and isinstance(newSprite, (Dot, Rect)):
+            self.engine.add(newSprite)
+        else:
+            self.otherSprites[newSprite] = None
+        if not newSprite.is_resting():
+            self.wake(newSprite)
+        if type(newSprite) == Button:
+            self.allButtons.append(newSprite)
+        elif type(newSprite) == HorizontalSlider:
+            self.allSliders.append(newSprite)
+            self.add_hittable(newSprite, newSprite.sliderButton)
+
+        self.tags.add(newSprite, tags)
+    
+    def add_button_and_sprite(self, attachedSprite, returnSignal, tags:list|str=[]):
+        self.add_sprite(attachedSprite, tags)
+
+        newButton = Button(attachedSprite, returnSignal)
+        self.allButtons.append(newButton)
+        self.add_hittable(newButton, attachedSprite)
+
+    def get_render_parts(self, sprite) -> list:
+        '''
+        Gets the sprites that own canvas items for a sprite, which is just the sprite except for sliders
+        
+        :param self: n/a
+        :param sprite: the sprite
+        :return: the sprites with canvas items
+        :rtype: list
+        '''
+        if isinstance(sprite, HorizontalSlider):
+            return [sprite.sliderBg, sprite.sliderButton]
+        return [sprite]
+
+    def detach_sprite(self, sprite):
+        '''
+        Takes a sprite out of every list, index and grid on this canvas, leaving its canvas items alone
+        
+        :param self: n/a
+        :param sprite: the sprite
+        '''
+        if sprite not in self.allSprites:
+            return
+        del self.allSprites[sprite]
+        self.otherSprites.pop(sprite, None)
+        self.activeSprites.pop(sprite, None)
+        if sprite.sleepTimer is not None:
+            self.cancel_timer(sprite.sleepTimer)
+            sprite.sleepTimer = None
+        sprite.visCanvas = None
+
+        if getattr(sprite, "engine", None) is self.engine and self.engine is not None:
+            idx, last = self.engine.remove(sprite)
+            changed = self.engineChanged[self.engineChanged != idx]
+            changed[changed == last] = idx
+            self.engineChanged = np.unique(changed)
+
+        for part in self.get_render_parts(sprite):
+            self.renderer.untrack(part)
+            for hittable in self.hitOwners.pop(part, []):
+                self.hitGrid.remove(hittable)
+                self.hitOrder.pop(hittable, None)
+                for hittables in (self.allButtons, self.allSliders, self.hoveredButtons, self.clickedSliders):
+                    if hittable in hittables:
+                        hittables.remove(hittable)
+        if sprite in self.allButtons:
+            self.allButtons.remove(sprite)
+
+        self.tags.remove_sprite(sprite)
+
+    def remove_sprite(self, sprite):
+        '''
+        Removes a sprite from this canvas and deletes its canvas items
+        
+        :param self: n/a
+        :param sprite: the sprite
+        '''
+        if sprite not in self.allSprites:
+            return
+        self.detach_sprite(sprite)
+        for part in self.get_render_parts(sprite):
+            self.canvas.delete(part.render_state()[0])
+            self.renderer.tkCalls += 1
+        sprite.initialized = False
+
+    def add_pooled_sprite(self, spriteClass, *args, tags:list|str=[], **kwargs):
+        '''
+        Adds a Dot or Rect made with the given arguments, reusing a released one and its canvas item if there is one
+        
+        :param self: n/a
+        :param spriteClass: Dot or Rect
+        :param tags: a list of string tags that apply to the sprite
+        :type tags: list
+        :return: the sprite
+        '''
+        sprite = self.pool.take(spriteClass, *args, **kwargs)
+        if sprite is None:
+            sprite = spriteClass(*args, **kwargs)
+        else:
+            item, coords, config = sprite.render_state()
+            self.canvas.coords(item, *coords)
+            self.canvas.itemconfig(item, state="normal", **config)
+            # a new sprite should be drawn on top
+            self.canvas.tag_raise(item)
+            self.renderer.tkCalls += 3
+        self.add_sprite(sprite, tags)
+        return sprite
+
+    def release_sprite(self, sprite):
+        '''
+        Removes a sprite from this canvas, hiding a Dot or Rect to be reused by add_pooled_sprite instead of deleting it
+        
+        :param self: n/a
+        :param sprite: the sprite
+        '''
+        if sprite not in self.allSprites:
+            return
+        if not self.pool.can_pool(sprite):
+            self.remove_sprite(sprite)
+            return
+
+        self.detach_sprite(sprite)
+        if self.pool.put(sprite):
+            self.canvas.itemconfig(sprite.render_state()[0], state="hidden")
+            self.renderer.tkCalls += 1
+        else:
+            self.canvas.delete(sprite.render_state()[0])
+            self.renderer.tkCalls += 1
+            sprite.initialized = False
+
+    def get_sprites_with_tag(self, tag:str) -> list:
+        '''
+        Returns a list of all sprites with the given tag
+        
+        :param self: n/a
+        :param tag: the desired tag
+        :type tag: str
+        :return: all sprites with the given tag
+        :rtype: list
+        '''
+        return self.tags.get(tag)
+
+    def add_tags(self, sprite, tags:list|str):
+        '''
+        Gives a sprite on this canvas more tags
+        
+        :param self: n/a
+        :param sprite: the sprite
+        :param tags: a tag or a list of tags
+        :type tags: list|str
+        '''
+        self.tags.add(sprite, tags)
+
+    def untag_sprite(self, sprite, tag:str):
+        '''
+        Takes one tag off a sprite
+        
+        :param self: n/a
+        :param sprite: the sprite
+        :param tag: the tag
+        :type tag: str
+        '''
+        self.tags.untag(sprite, tag)
+
+    def remove_tag(self, tag:str):
+        '''
+        Takes a tag off every sprite, leaving the sprites on the canvas
+        
+        :param self: n/a
+        :param tag: the tag
+        :type tag: str
+        '''
+        self.tags.remove_tag(tag)
+
+    def get_tags(self, sprite) -> set:
+        '''
+        Gets the tags of a sprite
+        
+        :param self: n/a
+        :param sprite: the sprite
+        :return: the tags
+        :rtype: set
+        '''
+        return self.tags.get_tags(sprite)
+
+    def query_tags(self, allTags:list=[], anyTags:list=[], notTags:list=[]) -> list:
+        '''
+        Gets the sprites that have all of allTags (AND), one of anyTags (OR) and none of notTags (NOT)
+        
+        :param self: n/a
+        :param allTags: tags a sprite must all have
+        :type allTags: list
+        :param anyTags: tags a sprite must have one of
+        :type anyTags: list
+        :param notTags: tags a sprite must not have
+        :type notTags: list
+        :return: the matching sprites
+        :rtype: list
+        '''
+        return self.tags.query(allTags, anyTags, notTags)
+
+    def split_engine_sprites(self, sprites:list) -> tuple:
+        '''
+        Splits sprites into the ones stored in the SpriteEngine and the rest
+        
+        :param self: n/a
+        :param sprites: the sprites
+        :type sprites: list
+        :return: an array of engine indices and a list of the other sprites
+        :rtype: tuple
+        '''
+        if self.engine is None:
+            return np.zeros(0, dtype=np.int64), sprites
+        indices = []
+        others = []
+        for sprite in sprites:
+            if getattr(sprite, "engine", None) is self.engine:
+                indices.append(sprite.engineIdx)
+            else:
+                others.append(sprite)
+        return np.array(indices, dtype=np.int64), others
+
+    def move_tag(self, tag:str, dX:float, dY:float, duration:int=0):
+        '''
+        Moves every sprite with a tag by the same amount, changing engine sprites in one array operation
+        
+        :param self: n/a
+        :param tag: the tag
+        :type tag: str
+        :param dX: the change in x
+        :type dX: float
+        :param dY: the change in y
+        :type dY: float
+        :param duration: the duration of the change in frames
+        :type duration: int
+        '''
+        indices, others = self.split_engine_sprites(self.tags.get(tag))
+        if len(indices) > 0:
+            a = self.engine.arrays
+            if duration == 0:
+                a["x"][indices] += dX
+                a["y"][indices] += dY
+                self.engineChanged = np.union1d(self.engineChanged, indices)
+            else:
+                a["endChange"][indices] = self.framesPassed + duration
+                a["dX"][indices] = dX/duration
+                a["dY"][indices] = dY/duration
+        for sprite in others:
+            sprite.change_pos(sprite.x+dX, sprite.y+dY, duration)
+
+    def recolor_tag(self, tag:str, color:str=None, outline:str=None):
+        '''
+        Changes the fill and/or outline color of every sprite with a tag. The changes are sent to tkinter together on the next draw
+        
+        :param self: n/a
+        :param tag: the tag
+        :type tag: str
+        :param color: a hex code for the fill color, or None to keep it
+        :type color: str
+        :param outline: a hex code for the outline color, or None to keep it
+        :type outline: str
+        '''
+        for sprite in self.tags.get(tag):
+            if color is not None and hasattr(sprite, "change_color"):
+                sprite.change_color(color)
+            if outline is not None and hasattr(sprite, "change_outline_color"):
+                sprite.change_outline_color(outline)
+
+    def delay_tag(self, tag:str, delayAmount:int):
+        '''
+        Delays every sprite with a tag, changing engine sprites in one array operation
+        
+        :param self: n/a
+        :param tag: the tag
+        :type tag: str
+        :param delayAmount: the delay length in frames
+        :type delayAmount: int
+        '''
+        indices, others = self.split_engine_sprites(self.tags.get(tag))
+        if len(indices) > 0:
+            self.engine.arrays["wait"][indices] = delayAmount
+        for sprite in others:
+            if hasattr(sprite, "delay"):
+                sprite.delay(delayAmount)
+    
+    def check_collision(self, cX1, cY1, w1, h1, cX2, cY2, w2, h2) -> bool:
+        retVal = False
+        if cX1 > cX2 and cX1 < (cX2 + w2):
+            if cY1 > cY2 and cY1 < (cY2 + h2):
+                retVal = True
+        elif cX2 > cX1 and cX2 < (cX1 + w1):
+            if cY2 > cY1 and cY2 < (cY1 + h1):
+                retVal = True
+        return retVal
+
+    def add_wall(self, x:int, y:int, w:int, h:int):
+        '''
+        Adds an invisible static box that sprites land on and can't move through
+        
+        :param self: n/a
+        :param x: the x position of the upper left corner of the wall
+        :type x: int
+        :param y: the y position of the upper left corner of the wall
+        :type y: int
+        :param w: the width of the wall
+        :type w: int
+        :param h: the height of the wall
+        :type h: int
+        '''
+        bounds = (x, y, x+w, y+h)
+        self.walls.insert(bounds, bounds)
+
+    def resolve_contacts(self, sprites:list, previous:dict={}):
+        '''
+        Pushes sprites out of any walls they have moved into and updates whether they are on the ground. A sprite is pushed back out of the side it came in from, by how far it went in, so a sprite moving further in a frame than a wall is thick still stops on it
+        
+        :param self: n/a
+        :param sprites: the sprites to check
+        :type sprites: list
+        :param previous: the (x, y) of each sprite before this frame's movement, sprites missing from it are pushed out of the nearest side
+        :type previous: dict
+        '''
+        if len(self.walls.bounds) == 0:
+            return
+
+        for sprite in sprites:
+            if not isinstance(sprite, (Dot, Rect)):
+                continue
+            if sprite.gravityScale == 0 and sprite.vX == 0 and sprite.vY == 0 and not sprite.onGround:
+                continue
+
+            x0, y0, x1, y1 = sprite.get_bounds()
+            prevX, prevY = previous.get(sprite, (sprite.x, sprite.y))
+            # the bounds before moving, assuming the size didn't change
+            pX0, pY0, pX1, pY1 = x0+prevX-sprite.x, y0+prevY-sprite.y, x1+prevX-sprite.x, y1+prevY-sprite.y
+            supported = False
+            for wall in self.walls.query_box((min(x0, pX0), min(y0, pY0), max(x1, pX1), max(y1, pY1)+1)):
+                overlapsX = x0 < wall[2] and x1 > wall[0]
+                overlapsY = y0 < wall[3] and y1 > wall[1]
+                if overlapsX and pY1 <= wall[1] and y1 > wall[1]:
+                    # landed on top
+                    sprite.change_pos(sprite.x, sprite.y-(y1-wall[1]))
+                    sprite.vY = min(sprite.vY, 0)
+                    supported = True
+                elif overlapsX and pY0 >= wall[3] and y0 < wall[3]:
+                    # hit from below
+                    sprite.change_pos(sprite.x, sprite.y+(wall[3]-y0))
+                    sprite.vY = max(sprite.vY, 0)
+                elif overlapsY and pX1 <= wall[0] and x1 > wall[0]:
+                    # hit the left side
+                    sprite.change_pos(sprite.x-(x1-wall[0]), sprite.y)
+                    sprite.vX = 0
+                elif overlapsY and pX0 >= wall[2] and x0 < wall[2]:
+                    # hit the right side
+                    sprite.change_pos(sprite.x+(wall[2]-x0), sprite.y)
+                    sprite.vX = 0
+                elif overlapsX and overlapsY:
+                    # was already inside, push out the way that moves it least
+                    overlapX = min(x1, wall[2]) - max(x0, wall[0])
+                    overlapY = min(y1, wall[3]) - max(y0, wall[1])
+                    if overlapY <= overlapX:
+                        if y0+y1 < wall[1]+wall[3]:
+                            sprite.change_pos(sprite.x, sprite.y-overlapY)
+                            sprite.vY = min(sprite.vY, 0)
+                            supported = True
+                        else:
+                            sprite.change_pos(sprite.x, sprite.y+overlapY)
+                            sprite.vY = max(sprite.vY, 0)
+                    else:
+                        if x0+x1 < wall[0]+wall[2]:
+                            sprite.change_pos(sprite.x-overlapX, sprite.y)
+                        else:
+                            sprite.change_pos(sprite.x+overlapX, sprite.y)
+                        sprite.vX = 0
+                elif overlapsX and y1 == wall[1]:
+                    # resting on top
+                    supported = True
+                else:
+                    continue
+                x0, y0, x1, y1 = sprite.get_bounds()
+            sprite.onGround = supported
+
+    def get_collisions(self, tag:str=None, otherTag:str=None, cellSize:int=64) -> list:
+        '''
+        Finds every pair of overlapping sprites using a spatial hash, so only sprites sharing a cell are compared
+        
+        :param self: n/a
+        :param tag: if given, only sprites with this tag are checked
+        :type tag: str
+        :param otherTag: if given, only collisions between sprites with tag and sprites with otherTag are returned
+        :type otherTag: str
+        :param cellSize: the width and height of each hash cell in pixels
+        :type cellSize: int
+        :return: a list of (sprite, otherSprite) pairs
+        :rtype: list
+        '''
+        if tag is None:
+            sprites = self.allSprites
+        else:
+            sprites = self.tags.get(tag)
+        sprites = [sprite for sprite in sprites if isinstance(sprite, (Dot, Rect))]
+
+        grid = SpatialGrid(cellSize)
+        if otherTag is None:
+            others = sprites
+        else:
+            others = [sprite for sprite in self.tags.get(otherTag) if isinstance(sprite, (Dot, Rect))]
+        order = {}
+        for sprite in others:
+            order[sprite] = len(order)
+            grid.insert(sprite, sprite.get_bounds())
+
+        collisions = []
+        for sprite in sprites:
+            bounds = sprite.get_bounds()
+            for other in sorted(grid.query_box(bounds), key=order.__getitem__):
+                if other is sprite:
+                    continue
+                if otherTag is None and order[other] < order[sprite]:
+                    # each pair only once
+                    continue
+                if boxes_overlap(bounds, grid.bounds[other]):
+                    collisions.append((sprite, other))
+        return collisions
+
+    def start_text_input(self, pause=True, endOnExitKey=True):
+        '''
+        Starts taking text input to get a text entry
+        
+        :param self: n/a
+        :param pause: if true, pauses all other updates until done taking text input
+        :param endOnEnter: if true, the text entry ends when the user hits enter/return
+        '''
+        self.paused = pause
+        self.takingTextInputDuringPause = pause
+        self.takingTextInput = True
+        self.endOnExitKey = endOnExitKey
+
+        self.textBuffer.clear()
     
     def stop_text_input(self):
         self.takingTextInput = False
@@ -817,27 +3214,175 @@ class VisCanvas():
     
     def update_keyboard_input(self, keypress):
         if (self.paused and self.takingTextInputDuringPause) or (not self.paused and self.takingTextInput):
-            if keypress.lower() in ["backspace", "delete"]:
-                self.textInput = self.textInput[:len(self.textInput)-1]
-            elif self.endOnExitKey and keypress.lower() in ["escape", "enter", "return"]:
+            key = keypress.lower()
+            if key == "backspace":
+                self.textBuffer.delete_before(1)
+            elif key == "delete":
+                self.textBuffer.delete_after(1)
+            elif key == "left":
+                self.textBuffer.move_cursor(-1)
+            elif key == "right":
+                self.textBuffer.move_cursor(1)
+            elif key == "home":
+                self.textBuffer.set_cursor(0)
+            elif key == "end":
+                self.textBuffer.set_cursor(len(self.textBuffer))
+            elif self.endOnExitKey and key in ["escape", "enter", "return"]:
                 self.stop_text_input()
-            elif keypress.lower() not in IGNORE_CHARS:
-                if keypress in CHARS.keys():
-                    self.textInput += CHARS[keypress]
-                else:
-                    self.textInput += keypress
+            elif key not in IGNORE_CHARS:
+                self.textBuffer.insert(CHARS.get(keypress, keypress))
+
+    def insert_text_input(self, text:str):
+        '''
+        Types a whole string at the cursor at once, eg for pasting
+        
+        :param self: n/a
+        :param text: the text to type
+        :type text: str
+        '''
+        self.textBuffer.insert(text)
+
+    def bind_text_input(self, textSprite):
+        '''
+        Makes a text sprite show the text input, updating only the edited characters on each change
+        
+        :param self: n/a
+        :param textSprite: the text sprite
+        '''
+        textSprite.change_text(self.textBuffer.get_text())
+        self.textBuffer.add_listener(textSprite.replace_span)
     
     def get_text_input(self) -> str:
-        return self.textInput
+        return self.textBuffer.get_text()
+
+    def get_text_cursor(self) -> int:
+        return self.textBuffer.get_cursor()
     
+    def bind_input(self, widget):
+        '''
+        Queues the mouse and key events of a tkinter widget, eg the root window, to be handled once per frame
+        
+        :param self: n/a
+        :param widget: the tkinter widget
+        '''
+        widget.bind('<KeyPress>', lambda event: self.queue_event("key", keysym=event.keysym))
+        widget.bind('<Button-1>', lambda event: self.queue_event("click", event.x, event.y))
+        widget.bind('<B1-Motion>', lambda event: self.queue_event("drag", event.x, event.y))
+        widget.bind('<ButtonRelease-1>', lambda event: self.queue_event("release", event.x, event.y))
+        widget.bind('<Motion>', lambda event: self.queue_event("motion", event.x, event.y))
+
+    def add_input_listener(self, kind:str, listener):
+        '''
+        Adds a function called with an InputEvent for every handled event of a kind
+        
+        :param self: n/a
+        :param kind: "click", "motion", "drag", "release" or "key"
+        :type kind: str
+        :param listener: a function taking an InputEvent
+        '''
+        self.inputListeners.setdefault(kind, []).append(listener)
+
+    def queue_event(self, kind:str, x:int=0, y:int=0, keysym:str=""):
+        '''
+        Adds an event to be handled on the next frame. Motion and drag events replace the one before them if nothing came in between
+        
+        :param self: n/a
+        :param kind: "click", "motion", "drag", "release" or "key"
+        :type kind: str
+        :param x: the x position of the mouse
+        :type x: int
+        :param y: the y position of the mouse
+        :type y: int
+        :param keysym: the key for key events
+        :type keysym: str
+        '''
+        event = InputEvent(kind, x, y, keysym)
+        if kind in COALESCED_EVENTS and len(self.inputQueue) > 0 and self.inputQueue[-1].kind == kind:
+            self.inputQueue[-1] = event
+        else:
+            self.inputQueue.append(event)
+
+    def dispatch_input(self):
+        '''
+        Handles every queued event in order, then passes each to its listeners, then sends any slider changes that were held back
+        
+        :param self: n/a
+        '''
+        while len(self.inputQueue) > 0:
+            event = self.inputQueue.popleft()
+            if event.kind == "click":
+                event.signals = self.update_mouse_click(event.x, event.y)
+            elif event.kind == "motion":
+                event.signals = self.update_mouse_motion(event.x, event.y)
+            elif event.kind == "drag":
+                self.update_mouse_drag(event.x, event.y)
+            elif event.kind == "release":
+                self.update_mouse_release(event.x, event.y)
+            elif event.kind == "key":
+                self.update_keyboard_input(event.keysym)
+
+            for listener in self.inputListeners.get(event.kind, []):
+                listener(event)
+
+        for sli in self.allSliders:
+            sli.poll_change()
+
+    def update_mouse_drag(self, mouseX, mouseY):
+        '''
+        Moves any sliders being held to the mouse
+        
+        :param self: n/a
+        :param mouseX: the x position of the mouse
+        :param mouseY: the y position of the mouse
+        '''
+        for sli in self.clickedSliders:
+            sli.move_slider(mouseX)
+
+    def update_mouse_release(self, mouseX, mouseY):
+        '''
+        Lets go of any sliders being held
+        
+        :param self: n/a
+        :param mouseX: the x position of the mouse
+        :param mouseY: the y position of the mouse
+        '''
+        for sli in self.clickedSliders:
+            sli.unClick()
+        self.clickedSliders = []
+
     def update_mouse_click(self, clickX, clickY):
-        print(clickX, ",", clickY)
         returnSignals = []
-        for but in self.allButtons:
-            if but.clicked(clickX, clickY):
-                returnSignals.append(but.getSignal())
+        clickedSliders = []
+        for hit in self.get_hits(clickX, clickY):
+            if isinstance(hit, Button):
+                if hit.clicked(clickX, clickY):
+                    returnSignals.append(hit.getSignal())
+            elif hit.clicked(clickX, clickY):
+                hit.move_slider(clickX)
+                clickedSliders.append(hit)
         
-        for sli in self.allSliders:
-            if sli.clicked(clickX, clickY):
-                sli.move_slider(clickX)
-        return returnSignals
\ No newline at end of file
+        for sli in self.clickedSliders:
+            if sli not in clickedSliders:
+                sli.unClick()
+        self.clickedSliders = clickedSliders
+        return returnSignals
+
+    def update_mouse_motion(self, mouseX, mouseY) -> list:
+        '''
+        Updates which buttons the mouse is over
+        
+        :param self: n/a
+        :param mouseX: the x position of the mouse
+        :param mouseY: the y position of the mouse
+        :return: the signals of all buttons under the mouse
+        :rtype: list
+        '''
+        for but in self.hoveredButtons:
+            but.hovered = False
+
+        self.hoveredButtons = []
+        for hit in self.get_hits(mouseX, mouseY):
+            if isinstance(hit, Button) and hit.clicked(mouseX, mouseY):
+                hit.hovered = True
+                self.hoveredButtons.append(hit)
+        return [but.getSignal() for but in self.hoveredButtons]
\ No newline at end of file
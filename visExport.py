@@ -0,0 +1,377 @@
+'''
+Saving visuals as video or animated images
+Frames are drawn offscreen and handed through a bounded queue to an encoder in a separate process, so drawing and encoding run at the same time and only a few frames are ever waiting in memory
+'''
+
+
+import os
+import queue
+import shutil
+import subprocess
+import multiprocessing
+from PIL import Image, ImageSequence
+import visHeadless as visH
+
+PILLOW_FORMATS = [".gif", ".png", ".apng", ".webp"]
+FFMPEG_ARGS = ["-c:v", "libx264", "-pix_fmt", "yuv420p", "-crf", "20"]
+# animated images ffmpeg can write as frames arrive, gifs get a palette per frame so no frames are held back to build one
+FFMPEG_IMAGE_ARGS = {
+    ".gif": ["-filter_complex", "[0:v]split[a][b];[a]palettegen=stats_mode=single[p];[b][p]paletteuse=new=1", "-loop", "0", "-f", "gif"],
+    ".png": ["-plays", "0", "-f", "apng"],
+    ".apng": ["-plays", "0", "-f", "apng"],
+}
+# Pillow keeps every frame of an animated image in memory until it saves, so longer exports print a warning
+PILLOW_WARN_FRAMES = 900
+
+def uses_pillow(filePath:str) -> bool:
+    '''
+    Checks if a file is saved with Pillow rather than with ffmpeg. Animated images go through ffmpeg when it is installed, except .webp
+
+    :param filePath: the output file
+    :type filePath: str
+    :return: true for animated images that ffmpeg can't write here
+    :rtype: bool
+    '''
+    ext = os.path.splitext(filePath)[1].lower()
+    if ext not in PILLOW_FORMATS:
+        return False
+    return ext not in FFMPEG_IMAGE_ARGS or shutil.which("ffmpeg") is None
+
+def get_ffmpeg_args(filePath:str, ffmpegArgs:list) -> list:
+    '''
+    Gets the ffmpeg output options for a file
+
+    :param filePath: the output file
+    :type filePath: str
+    :param ffmpegArgs: the options for videos
+    :type ffmpegArgs: list
+    :return: the options for animated images, or ffmpegArgs for videos
+    :rtype: list
+    '''
+    return FFMPEG_IMAGE_ARGS.get(os.path.splitext(filePath)[1].lower(), ffmpegArgs)
+
+def warn_pillow_frames(filePath:str, frameCount:int):
+    '''
+    Warns once when a Pillow export gets long enough that holding its frames uses a lot of memory
+
+    :param filePath: the output file
+    :type filePath: str
+    :param frameCount: the number of frames so far
+    :type frameCount: int
+    '''
+    if frameCount == PILLOW_WARN_FRAMES:
+        print("Warning: "+filePath+" is over "+str(PILLOW_WARN_FRAMES)+" frames and Pillow keeps every frame in memory until it saves. Install ffmpeg to stream .gif and .png exports, or export a video")
+
+class FrameWriter():
+    def __init__(self, filePath:str, width:int, height:int, fps:float, ffmpegArgs:list=FFMPEG_ARGS):
+        '''
+        Opens an output file for raw RGB frames
+
+        Videos, and animated images when ffmpeg is installed, are streamed straight into ffmpeg. Otherwise Pillow needs every frame before it can save, so those are kept until close, reduced to a palette for gifs
+
+        :param self: n/a
+        :param filePath: the output file
+        :type filePath: str
+        :param width: the frame width
+        :type width: int
+        :param height: the frame height
+        :type height: int
+        :param fps: the frames per second of the output
+        :type fps: float
+        :param ffmpegArgs: the ffmpeg output options for videos
+        :type ffmpegArgs: list
+        '''
+        self.filePath = filePath
+        self.width = width
+        self.height = height
+        self.fps = fps
+
+        self.frames = []
+        self.process = None
+        if not uses_pillow(filePath):
+            command = ["ffmpeg", "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", str(width)+"x"+str(height), "-r", str(fps), "-i", "-"] + get_ffmpeg_args(filePath, ffmpegArgs) + [filePath]
+            self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+    def write(self, data:bytes):
+        '''
+        Adds a frame
+
+        :param self: n/a
+        :param data: the raw RGB bytes of the frame
+        :type data: bytes
+        '''
+        if self.process is not None:
+            self.process.stdin.write(data)
+            return
+        frame = Image.frombytes("RGB", (self.width, self.height), data)
+        if self.filePath.lower().endswith(".gif"):
+            frame = frame.quantize(256)
+        self.frames.append(frame)
+        warn_pillow_frames(self.filePath, len(self.frames))
+
+    def close(self):
+        '''
+        Finishes writing the file
+
+        :param self: n/a
+        '''
+        if self.process is not None:
+            self.process.stdin.close()
+            if self.process.wait() != 0:
+                raise RuntimeError("ffmpeg exited with code "+str(self.process.returncode))
+        elif len(self.frames) > 0:
+            self.frames[0].save(self.filePath, save_all=True, append_images=self.frames[1:], duration=round(1000/self.fps), loop=0)
+            self.frames = []
+
+def encode_frames(frameQueue, filePath:str, width:int, height:int, fps:float, ffmpegArgs:list):
+    '''
+    Encoder process. Takes raw RGB frames from the queue until it gets None and writes them to the file
+
+    :param frameQueue: the queue of frame bytes
+    :param filePath: the output file
+    :type filePath: str
+    :param width: the frame width
+    :type width: int
+    :param height: the frame height
+    :type height: int
+    :param fps: the frames per second of the output
+    :type fps: float
+    :param ffmpegArgs: the ffmpeg output options
+    :type ffmpegArgs: list
+    '''
+    writer = FrameWriter(filePath, width, height, fps, ffmpegArgs)
+    while True:
+        data = frameQueue.get()
+        if data is None:
+            break
+        writer.write(data)
+    writer.close()
+
+def get_fork_context():
+    '''
+    Gets a multiprocessing context that forks if the platform can. Forking doesn't rerun the calling script, which spawning would for scripts without a __main__ check
+
+    :return: the context
+    '''
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+class VideoExporter():
+    def __init__(self, filePath:str, width:int, height:int, fps:float, queueSize:int=32, ffmpegArgs:list=FFMPEG_ARGS):
+        '''
+        Starts an encoder process for a file
+
+        :param self: n/a
+        :param filePath: the output file, videos need ffmpeg, .gif, .png and .apng use ffmpeg if it is installed and Pillow otherwise, and .webp uses Pillow
+        :type filePath: str
+        :param width: the frame width
+        :type width: int
+        :param height: the frame height
+        :type height: int
+        :param fps: the frames per second of the output
+        :type fps: float
+        :param queueSize: the most frames that can wait for the encoder before drawing pauses
+        :type queueSize: int
+        :param ffmpegArgs: the ffmpeg output options
+        :type ffmpegArgs: list
+        '''
+        self.filePath = filePath
+        self.width = width
+        self.height = height
+        self.frameCount = 0
+
+        context = get_fork_context()
+        self.frameQueue = context.Queue(maxsize=queueSize)
+        self.process = context.Process(target=encode_frames, args=(self.frameQueue, filePath, width, height, fps, ffmpegArgs), daemon=True)
+        self.process.start()
+
+    def put(self, data):
+        '''
+        Waits for room in the queue and adds to it, stopping if the encoder has died
+
+        :param self: n/a
+        :param data: the frame bytes or None
+        '''
+        while True:
+            try:
+                self.frameQueue.put(data, timeout=1)
+                return
+            except queue.Full:
+                if not self.process.is_alive():
+                    raise RuntimeError("Encoder stopped with exit code "+str(self.process.exitcode))
+
+    def add_frame(self, frame:Image.Image):
+        '''
+        Sends a frame to the encoder
+
+        :param self: n/a
+        :param frame: the frame, the same size as the exporter
+        :type frame: Image.Image
+        '''
+        if frame.size != (self.width, self.height):
+            raise ValueError("Frame is "+str(frame.size)+" but the export is "+str((self.width, self.height)))
+        self.put(frame.convert("RGB").tobytes())
+        self.frameCount += 1
+
+    def close(self):
+        '''
+        Waits for the encoder to finish writing the file
+
+        :param self: n/a
+        '''
+        self.put(None)
+        self.process.join()
+        if self.process.exitcode != 0:
+            raise RuntimeError("Encoder stopped with exit code "+str(self.process.exitcode))
+
+def export_video(visCanvas, filePath:str, frameCount:int, fps:float, onStep=None, queueSize:int=32, ffmpegArgs:list=FFMPEG_ARGS, progressEvery:int=0):
+    '''
+    Steps a VisCanvas drawn on a visHeadless.ImageCanvas one frame at a time and saves every frame to a file
+
+    :param visCanvas: the VisCanvas, made with an ImageCanvas
+    :param filePath: the output file
+    :type filePath: str
+    :param frameCount: the number of frames to save
+    :type frameCount: int
+    :param fps: the frames per second of the output
+    :type fps: float
+    :param onStep: a function with no arguments called before each step
+    :param queueSize: the most frames that can wait for the encoder
+    :type queueSize: int
+    :param ffmpegArgs: the ffmpeg output options
+    :type ffmpegArgs: list
+    :param progressEvery: print progress every this many frames, or never if 0
+    :type progressEvery: int
+    '''
+    exporter = VideoExporter(filePath, visCanvas.canvas.width, visCanvas.canvas.height, fps, queueSize, ffmpegArgs)
+    try:
+        for frame in visH.render_frames(visCanvas, frameCount, onStep):
+            exporter.add_frame(frame)
+            if progressEvery > 0 and exporter.frameCount % progressEvery == 0:
+                print("Exported "+str(exporter.frameCount)+" of "+str(frameCount)+" frames")
+    finally:
+        exporter.close()
+
+def render_chunk(visCanvas, partPath:str, startFrame:int, endFrame:int, fps:float, onStep, ffmpegArgs:list):
+    '''
+    Worker process. Steps a forked copy of the scene to startFrame without drawing, then saves frames startFrame to endFrame to its own file
+
+    :param visCanvas: the VisCanvas, made with an ImageCanvas
+    :param partPath: the file for this chunk
+    :type partPath: str
+    :param startFrame: the first frame of the chunk
+    :type startFrame: int
+    :param endFrame: the frame after the last frame of the chunk
+    :type endFrame: int
+    :param fps: the frames per second of the output
+    :type fps: float
+    :param onStep: a function with no arguments called before each step
+    :param ffmpegArgs: the ffmpeg output options
+    :type ffmpegArgs: list
+    '''
+    # every step runs, so animations, delays and timers are where a serial export has them
+    visH.skip_frames(visCanvas, startFrame, onStep)
+    writer = FrameWriter(partPath, visCanvas.canvas.width, visCanvas.canvas.height, fps, ffmpegArgs)
+    for frame in visH.render_frames(visCanvas, endFrame-startFrame, onStep):
+        writer.write(frame.convert("RGB").tobytes())
+    writer.close()
+
+def iter_part_frames(partPaths:list, filePath:str):
+    '''
+    Yields every frame of the chunk files in order, opening one chunk at a time
+
+    :param partPaths: the chunk files
+    :type partPaths: list
+    :param filePath: the output file, for the long export warning
+    :type filePath: str
+    '''
+    frameCount = 0
+    for partPath in partPaths:
+        with Image.open(partPath) as part:
+            for frame in ImageSequence.Iterator(part):
+                frameCount += 1
+                warn_pillow_frames(filePath, frameCount)
+                if filePath.lower().endswith(".gif"):
+                    # the same palette FrameWriter would have made from the original frame
+                    newFrame = frame.convert("RGB").quantize(256)
+                    newFrame.info = dict(frame.info)
+                    yield newFrame
+                else:
+                    yield frame.copy()
+
+def concat_files(partPaths:list, filePath:str):
+    '''
+    Joins chunk files, in order, into one file
+
+    :param partPaths: the chunk files
+    :type partPaths: list
+    :param filePath: the output file
+    :type filePath: str
+    '''
+    if uses_pillow(filePath):
+        # without a duration option Pillow keeps each frame's own, which is longer for frames merged with repeats of them
+        frames = iter_part_frames(partPaths, filePath)
+        next(frames).save(filePath, save_all=True, append_images=frames, loop=0)
+        return
+
+    listPath = filePath+".parts.txt"
+    with open(listPath, "w") as file:
+        for partPath in partPaths:
+            file.write("file '"+os.path.abspath(partPath).replace("'", "'\\''")+"'\n")
+    try:
+        # animated images can't be joined without re-encoding, which ffmpeg still does a frame at a time
+        outputArgs = get_ffmpeg_args(filePath, ["-c", "copy"])
+        subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", listPath] + outputArgs + [filePath], check=True)
+    finally:
+        os.remove(listPath)
+
+def export_parallel(visCanvas, filePath:str, frameCount:int, fps:float, onStep=None, workers:int=None, ffmpegArgs:list=FFMPEG_ARGS):
+    '''
+    Saves frames like export_video, but splits them into one chunk per worker process and joins the chunks at the end
+
+    Each worker gets a forked copy of the scene as it is now and steps it up to its chunk without drawing, which costs far less than drawing, so every chunk matches a serial export. Without fork the frames are saved in one process instead
+
+    :param visCanvas: the VisCanvas, made with an ImageCanvas and not yet stepped
+    :param filePath: the output file
+    :type filePath: str
+    :param frameCount: the number of frames to save
+    :type frameCount: int
+    :param fps: the frames per second of the output
+    :type fps: float
+    :param onStep: a function with no arguments called before each step, including the steps a worker skips
+    :param workers: the number of worker processes, defaults to the number of cores
+    :type workers: int
+    :param ffmpegArgs: the ffmpeg output options
+    :type ffmpegArgs: list
+    '''
+    if "fork" not in multiprocessing.get_all_start_methods():
+        print("Parallel export needs fork, exporting in one process")
+        export_video(visCanvas, filePath, frameCount, fps, onStep, ffmpegArgs=ffmpegArgs)
+        return
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, frameCount))
+    bounds = [frameCount*i//workers for i in range(workers+1)]
+    base, ext = os.path.splitext(filePath)
+    partPaths = [base+".part"+str(i)+ext for i in range(workers)]
+
+    context = multiprocessing.get_context("fork")
+    processes = []
+    for i in range(workers):
+        process = context.Process(target=render_chunk, args=(visCanvas, partPaths[i], bounds[i], bounds[i+1], fps, onStep, ffmpegArgs))
+        process.start()
+        processes.append(process)
+    for process in processes:
+        process.join()
+
+    try:
+        for i, process in enumerate(processes):
+            if process.exitcode != 0:
+                raise RuntimeError("Chunk "+str(i)+" stopped with exit code "+str(process.exitcode))
+        concat_files(partPaths, filePath)
+    finally:
+        for partPath in partPaths:
+            if os.path.exists(partPath):
+                os.remove(partPath)
@@ -0,0 +1,300 @@
+'''
+Drawing without a display
+ImageCanvas stands in for the tkinter canvas, keeping the same items and drawing them into a Pillow image on demand, so a VisCanvas can step and save frames as fast as the machine allows
+'''
+
+
+from collections import OrderedDict
+from PIL import Image, ImageDraw, ImageFont
+import visCanvas as visC
+
+# tkinter font sizes are in points, Pillow font sizes are in pixels
+POINTS_TO_PIXELS = 96/72
+
+class ImageFontMeasure():
+    def __init__(self, family:str, size:int):
+        '''
+        Loads a Pillow font for a tkinter style font name and size, falling back to Pillow's default font if the name can't be found
+
+        :param self: n/a
+        :param family: the name of the font
+        :type family: str
+        :param size: the font size in points
+        :type size: int
+        '''
+        pixels = max(1, round(size*POINTS_TO_PIXELS))
+        self.font = None
+        for fileName in [family, family+".ttf", family.lower()+".ttf", family.replace(" ", "")+".ttf"]:
+            try:
+                self.font = ImageFont.truetype(fileName, pixels)
+                break
+            except OSError:
+                pass
+        if self.font is None:
+            self.font = ImageFont.load_default(pixels)
+
+    def measure(self, text:str) -> int:
+        '''
+        Gets the width of a string
+
+        :param self: n/a
+        :param text: the text to measure
+        :type text: str
+        :return: the width in pixels
+        :rtype: int
+        '''
+        return round(self.font.getlength(text))
+
+def to_fill(color:str):
+    '''
+    Converts a tkinter color option to a Pillow one, where an empty string means not drawn
+
+    :param color: the tkinter color
+    :type color: str
+    :return: the Pillow color or None
+    '''
+    if color is None or color == "":
+        return None
+    return color
+
+class ImageCanvas():
+    def __init__(self, width:int, height:int, bg:str="#000"):
+        '''
+        Sets up an empty offscreen canvas
+
+        :param self: n/a
+        :param width: the width of the frames
+        :type width: int
+        :param height: the height of the frames
+        :type height: int
+        :param bg: the background color
+        :type bg: str
+        '''
+        self.width = width
+        self.height = height
+        self.bg = bg
+
+        self.items = OrderedDict()
+        self.nextId = 1
+        self.fontMetrics = visC.FontMetrics(fontFactory=ImageFontMeasure)
+
+    def create_item(self, kind:str, coords:tuple, options:dict) -> int:
+        '''
+        Adds an item on top of all the others
+
+        :param self: n/a
+        :param kind: "oval", "rectangle" or "text"
+        :type kind: str
+        :param coords: the item coords
+        :type coords: tuple
+        :param options: the item options
+        :type options: dict
+        :return: the item id
+        :rtype: int
+        '''
+        item = self.nextId
+        self.nextId += 1
+        self.items[item] = [kind, list(coords), dict(options)]
+        return item
+
+    def create_oval(self, *coords, **options) -> int:
+        return self.create_item("oval", coords, {"fill": "", "outline": "black"} | options)
+
+    def create_rectangle(self, *coords, **options) -> int:
+        return self.create_item("rectangle", coords, {"fill": "", "outline": "black"} | options)
+
+    def create_text(self, *coords, **options) -> int:
+        return self.create_item("text", coords, {"fill": "black", "text": "", "font": ("TkDefaultFont", 10), "justify": "left", "width": 0, "anchor": "center"} | options)
+
+    def coords(self, item:int, *coords) -> list:
+        '''
+        Moves an item if coords are given, like tkinter
+
+        :param self: n/a
+        :param item: the item id
+        :type item: int
+        :return: the item coords
+        :rtype: list
+        '''
+        if len(coords) > 0:
+            self.items[item][1] = list(coords)
+        return self.items[item][1]
+
+    def itemconfig(self, item:int, **options):
+        self.items[item][2].update(options)
+
+    def delete(self, item):
+        '''
+        Removes an item, or every item if given "all"
+
+        :param self: n/a
+        :param item: the item id or "all"
+        '''
+        if item == "all":
+            self.items.clear()
+        else:
+            self.items.pop(item, None)
+
+    def tag_raise(self, item:int):
+        '''
+        Moves an item on top of all the others
+
+        :param self: n/a
+        :param item: the item id
+        :type item: int
+        '''
+        self.items.move_to_end(item)
+
+    def get_text_index(self, text:str, index) -> int:
+        if index == "end":
+            return len(text)
+        return int(index)
+
+    def dchars(self, item:int, first, last=None):
+        '''
+        Deletes the characters of a text item from first to last, including last, like tkinter
+
+        :param self: n/a
+        :param item: the item id
+        :type item: int
+        :param first: the first index to delete
+        :param last: the last index to delete, defaults to first
+        '''
+        text = self.items[item][2]["text"]
+        first = self.get_text_index(text, first)
+        last = first if last is None else min(self.get_text_index(text, last), len(text)-1)
+        self.items[item][2]["text"] = text[:first] + text[last+1:]
+
+    def insert(self, item:int, index, newText:str):
+        '''
+        Inserts characters into a text item before index, like tkinter
+
+        :param self: n/a
+        :param item: the item id
+        :type item: int
+        :param index: the index to insert before, or "end"
+        :param newText: the characters to insert
+        :type newText: str
+        '''
+        text = self.items[item][2]["text"]
+        index = self.get_text_index(text, index)
+        self.items[item][2]["text"] = text[:index] + newText + text[index:]
+
+    def wrap_text(self, text:str, family:str, size:int, width:int) -> list:
+        '''
+        Splits text into lines no wider than width, breaking between words like tkinter
+
+        :param self: n/a
+        :param text: the text to split
+        :type text: str
+        :param family: the name of the font
+        :type family: str
+        :param size: the font size
+        :type size: int
+        :param width: the widest a line can be, or 0 for no wrapping
+        :type width: int
+        :return: the lines
+        :rtype: list
+        '''
+        lines = []
+        for paragraph in text.split("\n"):
+            if width <= 0:
+                lines.append(paragraph)
+                continue
+            line = ""
+            for word in paragraph.split(" "):
+                attempt = word if line == "" else line+" "+word
+                if line != "" and self.fontMetrics.measure(attempt, family, size) > width:
+                    lines.append(line)
+                    line = word
+                else:
+                    line = attempt
+            lines.append(line)
+        return lines
+
+    def draw_text(self, draw, coords:list, options:dict):
+        '''
+        Draws a text item, wrapped to its width and placed by its nw anchor
+
+        :param self: n/a
+        :param draw: the Pillow ImageDraw
+        :param coords: the [x, y] of the item
+        :type coords: list
+        :param options: the item options
+        :type options: dict
+        '''
+        fill = to_fill(options["fill"])
+        if fill is None or options["text"] == "":
+            return
+        family, size = options["font"][0], options["font"][1]
+        font = self.fontMetrics.get_font(family, size)[0]
+        lines = self.wrap_text(options["text"], family, size, options["width"])
+
+        x, y = coords[0], coords[1]
+        boxWidth = options["width"]
+        if boxWidth <= 0:
+            boxWidth = max(self.fontMetrics.measure(line, family, size) for line in lines)
+        lineHeight = sum(font.font.getmetrics())
+        for line in lines:
+            lineWidth = self.fontMetrics.measure(line, family, size)
+            lineX = x
+            if options["justify"] == "center":
+                lineX = x + (boxWidth-lineWidth)/2
+            elif options["justify"] == "right":
+                lineX = x + boxWidth-lineWidth
+            draw.text((lineX, y), line, fill=fill, font=font.font)
+            y += lineHeight
+
+    def get_frame(self) -> Image.Image:
+        '''
+        Draws every item, bottom to top, into a new image
+
+        :param self: n/a
+        :return: the frame
+        :rtype: Image.Image
+        '''
+        frame = Image.new("RGB", (self.width, self.height), self.bg)
+        draw = ImageDraw.Draw(frame)
+        for kind, coords, options in self.items.values():
+            if options.get("state") == "hidden":
+                continue
+            if kind == "text":
+                self.draw_text(draw, coords, options)
+                continue
+
+            x0, x1 = sorted((coords[0], coords[2]))
+            y0, y1 = sorted((coords[1], coords[3]))
+            if kind == "oval":
+                draw.ellipse((x0, y0, x1, y1), fill=to_fill(options["fill"]), outline=to_fill(options["outline"]))
+            else:
+                draw.rectangle((x0, y0, x1, y1), fill=to_fill(options["fill"]), outline=to_fill(options["outline"]))
+        return frame
+
+def render_frames(visCanvas, frameCount:int, onStep=None):
+    '''
+    Steps a VisCanvas drawn on an ImageCanvas and yields a frame after each step, without waiting between frames
+
+    :param visCanvas: the VisCanvas, made with an ImageCanvas
+    :param frameCount: the number of frames to make
+    :type frameCount: int
+    :param onStep: a function with no arguments called before each step
+    '''
+    for _ in range(frameCount):
+        if onStep is not None:
+            onStep()
+        visCanvas.update()
+        yield visCanvas.canvas.get_frame()
+
+def skip_frames(visCanvas, frameCount:int, onStep=None):
+    '''
+    Steps a VisCanvas drawn on an ImageCanvas without making frames, which only updates the items and so is much faster than render_frames
+
+    :param visCanvas: the VisCanvas, made with an ImageCanvas
+    :param frameCount: the number of steps
+    :type frameCount: int
+    :param onStep: a function with no arguments called before each step
+    '''
+    for _ in range(frameCount):
+        if onStep is not None:
+            onStep()
+        visCanvas.update()